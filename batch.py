@@ -0,0 +1,157 @@
+#dávkové spouštění úloh (program, vstup) na více procesech (volba --batch)
+
+import io
+import json
+import multiprocessing
+from sys import stderr, stdout
+from multiprocessing import shared_memory
+
+from interpret import IPPError, SourceError, loadProgram, openInput, runProgram
+from image import ImageProgram, buildImage
+
+#dávkové spouštění úloh (program, vstup) na více procesech
+#úlohy se seskupí podle programu a rozdělí na bloky, worker každý program parsuje jen jednou
+#a naposledy načtený program si pamatuje i pro další bloky stejného programu
+batchProgram = (None, None)
+#s --image workery spouští programy z obrazů ve sdílené paměti, segmenty zůstávají připojené po celou dobu workeru
+batchSegments = dict()
+
+#spustí jeden program nad jedním vstupem, vrací dvojici (návratový kód, stdout)
+#pád interpretu mimo IPPError ukončí jen tuto úlohu s kódem vnitřní chyby (99), ostatní úlohy dávky doběhnou
+#limits jsou parametry třídy Budget pro každou úlohu zvlášť, None znamená bez omezení
+def runJob(program, inputPath, limits = None):
+    output = io.StringIO()
+    try:
+        inputFile = openInput(inputPath) if inputPath else io.StringIO("")
+    except IPPError as e:
+        stderr.write(str(e))
+        return (e.code, "")
+    with inputFile:
+        try:
+            code = runProgram(program, inputFile, output, limits)
+        except Exception as e:
+            stderr.write("internal error {}: {}\n".format(type(e).__name__, e))
+            code = IPPError.code
+    return (code, output.getvalue())
+
+#spustí program nad více vstupy najednou v lockstep režimu (modul lockstep, vyžaduje NumPy)
+#vrací None, pokud NumPy není k dispozici nebo lockstep spadne mimo IPPError
+#(úlohy se pak spustí jednotlivě přes runJob)
+def runLockstepJobs(program, jobs):
+    try:
+        from lockstep import runLockstep
+    except ImportError:
+        return None
+    results = []
+    inputFiles = []
+    indexes = []
+    for index, inputPath in jobs:
+        try:
+            inputFiles.append(openInput(inputPath) if inputPath else io.StringIO(""))
+            indexes.append(index)
+        except IPPError as e:
+            stderr.write(str(e))
+            results.append((index, e.code, ""))
+    try:
+        for index, (code, output) in zip(indexes, runLockstep(program, inputFiles)):
+            results.append((index, code, output))
+    except Exception as e:
+        stderr.write("internal error {}: {}\n".format(type(e).__name__, e))
+        return None
+    finally:
+        for inputFile in inputFiles:
+            inputFile.close()
+    return results
+
+#zpracuje jeden blok úloh téhož programu ve workeru
+#image je název segmentu sdílené paměti s obrazem programu, nebo None (program se načte ze source)
+def runBatchChunk(chunk):
+    global batchProgram
+    source, jobs, lockstep, image, limits = chunk
+    results = []
+    if image is not None:
+        if image not in batchSegments:
+            segment = shared_memory.SharedMemory(image)
+            batchSegments[image] = (segment, ImageProgram(segment.buf))
+        batchProgram = (image, batchSegments[image][1])
+    elif batchProgram[0] != source:
+        try:
+            batchProgram = (source, loadProgram(source))
+            batchProgram[1].link()
+        except IPPError as e:
+            stderr.write(str(e))
+            batchProgram = (None, None)
+            for index, inputPath in jobs:
+                results.append((index, e.code, ""))
+            return results
+    if lockstep:
+        lockstepResults = runLockstepJobs(batchProgram[1], jobs)
+        if lockstepResults is not None:
+            return lockstepResults
+    for index, inputPath in jobs:
+        code, output = runJob(batchProgram[1], inputPath, limits)
+        results.append((index, code, output))
+    return results
+
+#manifest obsahuje na každém řádku JSON objekt {"source": ..., "input": ...}
+#výsledky se zapisují ve stejném pořadí jako JSON řádky s návratovým kódem a výstupem úlohy
+#s lockstep se úlohy jednoho bloku spouští najednou přes modul lockstep
+#s image hlavní proces každý program načte jen jednou a jeho obraz (buildImage) uloží do sdílené paměti,
+#workery ho spouští přímo z ní (ImageProgram) a nedrží si vlastní kopii programu
+#(programy, které nejde načíst nebo slinkovat, načítají workery samy a ohlásí chybu jako bez image)
+#limits (parametry třídy Budget) omezují každou úlohu zvlášť, lockstep je nekontroluje, proto s ním skončí chybou
+def runBatch(manifest, resultsPath, workers, lockstep = False, image = False, limits = None):
+    if lockstep and limits is not None:
+        raise IPPError("wrong combination of parameters", 10)
+    jobs = []
+    try:
+        with open(manifest, "r") as fp:
+            for line in fp:
+                if line.strip() == "":
+                    continue
+                job = json.loads(line)
+                #prázdný source by loadProgram četl ze stdin, číselný input by openInput otevřel jako deskriptor
+                if type(job["source"]) != str or job["source"] == "":
+                    raise SourceError("missing source in job {}".format(line.strip()))
+                if job.get("input") is not None and type(job["input"]) != str:
+                    raise SourceError("wrong input in job {}".format(line.strip()))
+                jobs.append((job["source"], job.get("input")))
+    except Exception as e:
+        raise SourceError("wrong batch manifest {}".format(e))
+    groups = dict()
+    for index, (source, inputPath) in enumerate(jobs):
+        groups.setdefault(source, []).append((index, inputPath))
+    segments = dict()
+    try:
+        if image:
+            for source in groups:
+                try:
+                    data = buildImage(loadProgram(source))
+                except IPPError:
+                    continue
+                segment = shared_memory.SharedMemory(create = True, size = max(1, len(data)))
+                segment.buf[:len(data)] = data
+                segments[source] = segment
+        chunks = []
+        for source, group in groups.items():
+            size = max(1, min(64, -(-len(group) // workers)))
+            segment = segments.get(source)
+            for i in range(0, len(group), size):
+                chunks.append((source, group[i:i+size], lockstep, segment.name if segment is not None else None, limits))
+        results = [None] * len(jobs)
+        with multiprocessing.Pool(workers) as pool:
+            for chunkResults in pool.imap_unordered(runBatchChunk, chunks):
+                for index, code, output in chunkResults:
+                    results[index] = (code, output)
+    finally:
+        for segment in segments.values():
+            segment.close()
+            segment.unlink()
+    try:
+        fp = open(resultsPath, "w") if resultsPath else stdout
+        for (source, inputPath), (code, output) in zip(jobs, results):
+            fp.write(json.dumps({"source": source, "input": inputPath, "exitCode": code, "stdout": output}) + "\n")
+        if fp is not stdout:
+            fp.close()
+    except Exception as e:
+        raise IPPError("cannot write batch results {}".format(e), 12)
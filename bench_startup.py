@@ -0,0 +1,77 @@
+#měření studeného startu interpretu na triviálním programu
+#spustí interpret opakovaně jako nový proces a porovná medián času s cílem
+#cíl je relativní k naměřenému minimu, tj. prázdnému pythonu s importem xml.etree, bez kterého program načíst nejde
+#(absolutní čas se mezi stroji liší víc než sám interpret), --overhead je povolená režie interpretu nad minimem v ms
+#s --importtime navíc vypíše nejdražší importy podle python -X importtime
+#
+#použití: python bench_startup.py [--runs=N] [--overhead=ms] [--importtime]
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+trivialProgram = """<?xml version="1.0" encoding="UTF-8"?>
+<program language="IPPcode23">
+<instruction order="1" opcode="WRITE"><arg1 type="string">ok</arg1></instruction>
+</program>
+"""
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+#vrací medián doby běhu příkazu v milisekundách
+def measure(command, runs):
+    times = []
+    for i in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdin = subprocess.DEVNULL, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL, cwd = here)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2]
+
+#vypíše nejdražší importy (kumulativní čas v us) spuštění interpretu
+def importTime(source, count = 15):
+    result = subprocess.run([sys.executable, "-X", "importtime", "interpret.py", "--source=" + source],
+                            stdin = subprocess.DEVNULL, stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, cwd = here, text = True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        selfTime, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    rows.sort(reverse = True)
+    print("nejdražší importy (kumulativní us):")
+    for cumulative, name in rows[:count]:
+        print("{:>10} {}".format(cumulative, name))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type = int, default = 21)
+    parser.add_argument("--overhead", type = float, default = 60.0)
+    parser.add_argument("--importtime", action = "store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "trivial.xml")
+        with open(source, "w") as fp:
+            fp.write(trivialProgram)
+        baseline = measure([sys.executable, "-c", "pass"], args.runs)
+        floor = measure([sys.executable, "-c", "import xml.etree.ElementTree"], args.runs)
+        script = measure([sys.executable, "interpret.py", "--source=" + source], args.runs)
+        module = measure([sys.executable, "-m", "interpret", "--source=" + source], args.runs)
+        print("prázdný python:         {:7.1f} ms".format(baseline))
+        print("python s xml.etree:     {:7.1f} ms".format(floor))
+        print("python interpret.py:    {:7.1f} ms".format(script))
+        print("python -m interpret:    {:7.1f} ms (používá předkompilovaný __pycache__)".format(module))
+        target = floor + args.overhead
+        print("cíl:                    {:7.1f} ms (minimum + {:.1f} ms)".format(target, args.overhead))
+        if args.importtime:
+            importTime(source)
+    if min(script, module) > target:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#omezení výpočtu (volby --max-instructions, --max-seconds, --max-stack a --max-bytes)
+
+import time
+
+from interpret import BudgetError
+
+#omezení výpočtu: počet provedených instrukcí, čas, hloubka datového zásobníku a zásobníku volání
+#a přibližná velikost hodnot v rámcích (v bajtech)
+#kontroluje se jako periodická kontrola interpretu každých checkInstructions instrukcí
+#(limit instrukcí se dodrží přesně), při překročení se výpočet ukončí chybou BudgetError
+#velikost paměti se počítá průchodem všech hodnot, proto se měří znovu až po memoryFactor instrukcích
+#na každou naposledy změřenou hodnotu, nebo dřív, když zásobníky (levné len()) narostou o polovinu
+#počtu změřených hodnot, nejpozději ale po memoryChecks kontrolách (memoryChecks * checkInstructions instrukcí)
+#limit paměti je tedy přibližný: program ho může překročit o to, co alokuje mezi dvěma měřeními
+#(např. opakovaný CONCAT řetězce se sebou samým ho zdvojnásobuje), pak skončí při nejbližším měření
+class Budget:
+    checkInstructions = 4096
+    memoryFactor = 8
+    memoryChecks = 8
+    def __init__(self, maxInstructions = None, maxSeconds = None, maxStack = None, maxBytes = None):
+        self.clock = time.monotonic
+        self.maxInstructions = maxInstructions
+        self.maxSeconds = maxSeconds
+        self.maxStack = maxStack
+        self.maxBytes = maxBytes
+        self.start = None
+        self.nextMemoryCheck = 0
+        self.measuredValues = 0
+        self.measuredStacks = 0
+    def check(self, interpreter):
+        if self.start is None:
+            self.start = self.clock()
+        memory = interpreter.memory
+        if self.maxInstructions is not None and interpreter.executed >= self.maxInstructions:
+            self.exceeded(interpreter, "instruction limit {}".format(self.maxInstructions))
+        if self.maxSeconds is not None and self.clock() - self.start >= self.maxSeconds:
+            self.exceeded(interpreter, "time limit {} s".format(self.maxSeconds))
+        if self.maxStack is not None and max(len(memory.dataStack), len(memory.callStack)) > self.maxStack:
+            self.exceeded(interpreter, "stack limit {}".format(self.maxStack))
+        if self.maxBytes is not None:
+            stacks = len(memory.dataStack) + len(memory.callStack) + len(memory.localFrames)
+            if interpreter.executed >= self.nextMemoryCheck or stacks - self.measuredStacks > self.measuredValues // 2:
+                size, values = memoryUsage(memory)
+                if size > self.maxBytes:
+                    self.exceeded(interpreter, "memory limit {} B".format(self.maxBytes))
+                self.nextMemoryCheck = interpreter.executed + min(self.memoryFactor * values,
+                                                                  self.memoryChecks * self.checkInstructions)
+                self.measuredValues = values
+                self.measuredStacks = stacks
+        steps = self.checkInstructions
+        if self.maxInstructions is not None:
+            steps = min(steps, self.maxInstructions - interpreter.executed)
+        return steps
+    def exceeded(self, interpreter, reason):
+        memory = interpreter.memory
+        raise BudgetError("budget exceeded: {}\n"
+                          "executed {} instructions in {:.3f} s, pc {}, data stack {}, call stack {}, memory {} B\n".format(
+                          reason, interpreter.executed, self.clock() - self.start, interpreter.pc,
+                          len(memory.dataStack), len(memory.callStack), memoryUsage(memory)[0]))
+
+#přibližná velikost hodnot uložených v paměti programu v bajtech a počet těchto hodnot
+#(řetězce podle délky, ostatní hodnoty a názvy proměnných zhruba jako jedno slovo)
+def memoryUsage(memory):
+    frames = [memory.globalFrame] + memory.localFrames
+    if memory.temporaryFrame is not None:
+        frames.append(memory.temporaryFrame)
+    size = 8 * len(memory.callStack) + valuesSize(memory.dataStack)
+    values = len(memory.callStack) + len(memory.dataStack)
+    for frame in frames:
+        values += len(frame.vars)
+        size += sum(map(len, frame.vars)) + valuesSize(frame.vars.values())
+    return size, values
+
+#velikost hodnot ze seznamu (nebo slovníku), prochází se celá paměť, proto bez volání funkce na každou hodnotu
+def valuesSize(values):
+    strings = [value for value in values if type(value) is str]
+    numbers = [value.bit_length() >> 3 for value in values if type(value) is int]
+    return 8 * len(values) + sum(map(len, strings)) + sum(numbers)
@@ -0,0 +1,127 @@
+#průběžné ukládání stavu výpočtu a jeho obnovení (volby --checkpoint a --resume)
+
+import io
+import os
+import marshal
+import time
+
+from interpret import Frame, IPPError, SourceError
+
+#snapshot stavu interpretu: pc, počet provedených instrukcí, počet řádků přečtených ze vstupu,
+#pozice ve výstupu, obsah všech rámců a zásobníků
+#ukládá se jako hlavička snapshotMagic a marshal n-tice (rychlé a kompaktní, hodnoty jsou jen int, str, bool a None)
+snapshotMagic = b"IPPS1\n"
+
+#uloží stav výpočtu interpretu do snapshotu (bytes)
+def snapshot(interpreter):
+    def frameVars(frame):
+        return None if frame is None else frame.vars
+    outputPosition = None
+    try:
+        interpreter.outputFile.flush()
+        if interpreter.outputFile.seekable():
+            outputPosition = interpreter.outputFile.tell()
+    except (AttributeError, OSError, ValueError):
+        pass
+    memory = interpreter.memory
+    state = (interpreter.program.fingerprint(), interpreter.pc, interpreter.executed, interpreter.linesRead, outputPosition,
+             memory.globalFrame.vars, frameVars(memory.temporaryFrame),
+             [frame.vars for frame in memory.localFrames], memory.callStack, memory.dataStack)
+    return snapshotMagic + marshal.dumps(state)
+#obnoví stav výpočtu interpretu ze snapshotu, přeskočí už přečtené řádky vstupu
+#a výstup vrátí na pozici při uložení (pokud to výstup umožňuje)
+def restore(interpreter, data):
+    try:
+        if not data.startswith(snapshotMagic):
+            raise ValueError("not a snapshot")
+        (fingerprint, pc, executed, linesRead, outputPosition, globalVars, temporaryVars,
+         localVars, callStack, dataStack) = marshal.loads(data[len(snapshotMagic):])
+    except Exception as e:
+        raise SourceError("wrong checkpoint {}".format(e))
+    if fingerprint != interpreter.program.fingerprint():
+        raise SourceError("checkpoint belongs to another program")
+    def makeFrame(variables):
+        if variables is None:
+            return None
+        frame = Frame()
+        frame.vars = variables
+        return frame
+    interpreter.memory.globalFrame = makeFrame(globalVars)
+    interpreter.memory.temporaryFrame = makeFrame(temporaryVars)
+    interpreter.memory.localFrames = [makeFrame(variables) for variables in localVars]
+    interpreter.memory.callStack = callStack
+    interpreter.memory.dataStack = dataStack
+    interpreter.pc = pc
+    interpreter.executed = executed
+    for i in range(linesRead - interpreter.linesRead):
+        interpreter.inputFile.readline()
+    interpreter.linesRead = linesRead
+    #výstup se vrací jen tehdy, když soubor ještě obsahuje výstup z doby uložení
+    #(např. shell při "> out.txt" soubor vyprázdní, pak se pokračuje od aktuální pozice)
+    if outputPosition is not None:
+        try:
+            if interpreter.outputFile.seekable():
+                current = interpreter.outputFile.tell()
+                if interpreter.outputFile.seek(0, io.SEEK_END) >= outputPosition:
+                    interpreter.outputFile.seek(outputPosition)
+                    interpreter.outputFile.truncate()
+                else:
+                    interpreter.outputFile.seek(current)
+        except (AttributeError, OSError, ValueError):
+            pass
+
+
+#periodické ukládání snapshotů do souboru každých everyInstructions instrukcí nebo everySeconds sekund
+#soubor se zapisuje atomicky (zápis do dočasného souboru a přejmenování), takže vždy obsahuje celý snapshot
+class Checkpointer:
+    #jak často se při ukládání podle času kontrolují hodiny
+    pollInstructions = 10000
+    def __init__(self, path, everyInstructions = None, everySeconds = None):
+        self.clock = time.monotonic
+        self.path = path
+        self.everyInstructions = everyInstructions
+        self.everySeconds = everySeconds
+        self.lastExecuted = 0
+        self.lastTime = self.clock()
+    #periodická kontrola, vrací počet instrukcí do další kontroly
+    def check(self, interpreter):
+        due = False
+        if self.everyInstructions is not None and interpreter.executed - self.lastExecuted >= self.everyInstructions:
+            due = True
+        if self.everySeconds is not None and self.clock() - self.lastTime >= self.everySeconds:
+            due = True
+        if due:
+            self.save(interpreter)
+        if self.everyInstructions is None:
+            return self.pollInstructions
+        steps = self.everyInstructions - (interpreter.executed - self.lastExecuted)
+        if self.everySeconds is not None:
+            steps = min(steps, self.pollInstructions)
+        return steps
+    def save(self, interpreter):
+        data = snapshot(interpreter)
+        temporary = self.path + ".tmp"
+        try:
+            with open(temporary, "wb") as fp:
+                fp.write(data)
+                fp.flush()
+                os.fsync(fp.fileno())
+            os.replace(temporary, self.path)
+        except OSError as e:
+            raise IPPError("cannot write checkpoint {}".format(e), 12)
+        self.lastExecuted = interpreter.executed
+        self.lastTime = self.clock()
+    #program doběhl, snapshot už není potřeba
+    def discard(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+#načte snapshot ze souboru
+def loadSnapshot(path):
+    try:
+        with open(path, "rb") as fp:
+            return fp.read()
+    except OSError as e:
+        raise SourceError("missing checkpoint file {}".format(e))
@@ -0,0 +1,548 @@
+#diferenciální testování rychlejších cest interpretu proti referenčnímu interpretu
+#generuje náhodné dobře formované programy v IPPcode23 (XML) a k nim vstupy,
+#každý případ spustí referenčním interpretem (třída Interpret bez voleb) a zvoleným kandidátem
+#a porovná návratové kódy a výstup WRITE bajt po bajtu (stderr se neporovnává)
+#případy se zpracovávají paralelně na více procesech, neshodný případ se minimalizuje
+#(odebírání instrukcí, vstupů a řádků vstupu, dokud se neshoda drží) a vypíše
+#
+#použití: python difftest.py [--cases=N] [--seed=S] [--jobs=N] [--candidates=memoize,lockstep,...]
+#                           [--inputs=K] [--max-instructions=N] [--out=adresář] [--no-minimize]
+
+import io
+import os
+import sys
+import random
+import argparse
+import traceback
+from xml.sax.saxutils import escape
+
+from interpret import Interpret, IPPError, parseProgram
+from budget import Budget
+from memoize import Memoizer
+
+#pracovní proměnné generovaných programů podle zamýšleného typu
+#(do proměnné mixed se ukládají hodnoty libovolného typu, čítače cyklů tělo cyklu nemění)
+intVars = ["GF@i0", "GF@i1", "GF@i2", "GF@i3"]
+stringVars = ["GF@s0", "GF@s1", "GF@s2"]
+boolVars = ["GF@b0", "GF@b1"]
+mixedVars = ["GF@m0"]
+#řetězec, který se po inicializaci nemění (přidává se ve smyčkách, aby řetězce nerostly exponenciálně)
+constantVars = ["GF@k0"]
+dataVars = intVars + stringVars + boolVars + mixedVars + constantVars
+stringAlphabet = ["a", "b", "c", "X", "Y", "0", "7", "á", "ž", "€", "<", "&", "\\032", "\\035", "\\092", "\\010"]
+
+#generátor náhodného programu, instrukce jsou dvojice (opcode, [(typ, hodnota), ...])
+#cykly mají vždy pevný počet opakování a podprogramy volají jen podprogramy s vyšším číslem,
+#takže program vždy skončí; chyby (53 až 58) vznikají záměrně i náhodnou kombinací typů
+class Generator:
+    def __init__(self, rng):
+        self.rng = rng
+        self.code = []
+        self.labels = 0
+        self.counters = 0
+        self.subroutines = rng.randint(0, 3)
+        self.pureSubroutines = set(i for i in range(self.subroutines) if rng.random() < 0.5)
+        self.reads = []
+    def label(self):
+        self.labels += 1
+        return "L{}".format(self.labels)
+    def emit(self, opcode, *args):
+        self.code.append((opcode, list(args)))
+
+    def intConst(self):
+        rng = self.rng
+        if rng.random() < 0.1:
+            return ("int", str(rng.choice([0, 1, -1, 2 ** 31, -2 ** 40, 10 ** 18])))
+        return ("int", str(rng.randint(-20, 20)))
+    def stringConst(self):
+        length = self.rng.randint(0, 5) if self.rng.random() < 0.2 else self.rng.randint(2, 5)
+        return ("string", "".join(self.rng.choice(stringAlphabet) for i in range(length)))
+    def boolConst(self):
+        return ("bool", self.rng.choice(["true", "false"]))
+    def var(self, names):
+        return ("var", self.rng.choice(names))
+    #operand daného typu: většinou proměnná nebo konstanta správného typu, občas cokoli
+    def symbol(self, kind):
+        rng = self.rng
+        if rng.random() < 0.01:
+            kind = rng.choice(["int", "string", "bool", "nil", "mixed"])
+        if kind == "nil":
+            return ("nil", "nil")
+        if kind == "mixed":
+            return self.var(mixedVars)
+        names = {"int": intVars, "string": stringVars, "bool": boolVars}[kind]
+        if rng.random() < 0.6:
+            return self.var(names)
+        return {"int": self.intConst, "string": self.stringConst, "bool": self.boolConst}[kind]()
+    def destination(self, kind):
+        if self.rng.random() < 0.1:
+            return self.var(mixedVars)
+        return self.var({"int": intVars, "string": stringVars, "bool": boolVars}[kind])
+
+    def program(self):
+        for name in dataVars:
+            self.emit("DEFVAR", ("var", name))
+        for name in intVars:
+            self.emit("MOVE", ("var", name), self.intConst())
+        for name in stringVars + constantVars:
+            self.emit("MOVE", ("var", name), self.stringConst())
+        for name in boolVars:
+            self.emit("MOVE", ("var", name), self.boolConst())
+        #proměnná mixed zůstane občas neinicializovaná (chyba 56)
+        if self.rng.random() < 0.8:
+            self.emit("MOVE", ("var", "GF@m0"), self.symbol(self.rng.choice(["int", "string", "bool", "nil"])))
+        self.block(self.rng.randint(3, 25), 0, None)
+        end = "end"
+        if self.rng.random() < 0.2:
+            self.emit("EXIT", ("int", str(self.rng.randint(0, 49))))
+        else:
+            self.emit("JUMP", ("label", end))
+        for index in range(self.subroutines):
+            self.subroutine(index)
+        self.emit("LABEL", ("label", end))
+        #čítače cyklů se deklarují na začátku programu
+        counters = [("DEFVAR", [("var", "GF@c{}".format(i))]) for i in range(self.counters)]
+        self.code = counters + self.code
+        return self.code
+
+    def block(self, count, depth, subroutine):
+        for i in range(count):
+            self.statement(depth, subroutine)
+    def statement(self, depth, subroutine):
+        rng = self.rng
+        choice = rng.random()
+        if choice < 0.18:
+            opcode = rng.choice(["ADD", "SUB", "MUL", "IDIV"])
+            self.emit(opcode, self.destination("int"), self.symbol("int"), self.factor() if opcode == "MUL" else self.symbol("int"))
+        elif choice < 0.26:
+            opcode = rng.choice(["LT", "GT", "EQ"])
+            kind = rng.choice(["int", "string", "bool"])
+            self.emit(opcode, self.destination("bool"), self.symbol(kind), self.symbol(kind if rng.random() < 0.9 else "nil"))
+        elif choice < 0.31:
+            opcode = rng.choice(["AND", "OR", "NOT"])
+            if opcode == "NOT":
+                self.emit(opcode, self.destination("bool"), self.symbol("bool"))
+            else:
+                self.emit(opcode, self.destination("bool"), self.symbol("bool"), self.symbol("bool"))
+        elif choice < 0.40:
+            opcode = rng.choice(["CONCAT", "STRLEN", "GETCHAR", "SETCHAR", "INT2CHAR", "STRI2INT"])
+            if opcode == "CONCAT":
+                self.emit(opcode, self.destination("string"), self.symbol("string"), self.stringConst())
+            elif opcode == "STRLEN":
+                self.emit(opcode, self.destination("int"), self.symbol("string"))
+            elif opcode == "GETCHAR":
+                self.emit(opcode, self.destination("string"), self.symbol("string"), self.index())
+            elif opcode == "SETCHAR":
+                self.emit(opcode, self.destination("string"), self.index(), self.symbol("string"))
+            elif opcode == "INT2CHAR":
+                self.emit(opcode, self.destination("string"), ("int", str(rng.choice([65, 97, 382, 8364, -1, 1114112]))))
+            else:
+                self.emit(opcode, self.destination("int"), self.symbol("string"), self.index())
+        elif choice < 0.43:
+            self.emit("TYPE", self.destination("string"), self.symbol(rng.choice(["int", "string", "bool", "nil", "mixed"])))
+        elif choice < 0.48:
+            kind = rng.choice(["int", "string", "bool"])
+            self.emit("MOVE", self.destination(kind), self.symbol(kind))
+        elif choice < 0.60:
+            self.emit("WRITE", self.symbol(rng.choice(["int", "string", "bool", "nil", "mixed"])))
+        elif choice < 0.66:
+            kind = rng.choice(["int", "string", "bool"])
+            self.reads.append(kind)
+            self.emit("READ", self.destination(kind), ("type", kind))
+        elif choice < 0.74:
+            self.stackStatement()
+        elif choice < 0.82 and depth < 3:
+            self.branch(depth, subroutine)
+        elif choice < 0.90 and depth < 2:
+            self.loop(depth, subroutine)
+        elif choice < 0.95:
+            targets = [index for index in range(self.subroutines) if subroutine is None or index > subroutine]
+            if targets:
+                self.call(rng.choice(targets))
+        elif choice < 0.96:
+            if rng.random() < 0.5:
+                self.emit("DPRINT", self.symbol(rng.choice(["int", "string"])))
+            else:
+                self.emit("BREAK")
+        elif choice < 0.965:
+            self.emit("EXIT", ("int", str(rng.choice([0, 3, 49, 50, -1]))))
+        else:
+            self.emit("WRITE", self.symbol("string"))
+    #násobitel a přidávaný řetězec jsou konstanty, aby hodnoty v cyklech rostly nejvýš lineárně (ne exponenciálně)
+    def factor(self):
+        return ("int", str(self.rng.randint(-3, 3)))
+    def index(self):
+        rng = self.rng
+        if rng.random() < 0.9:
+            return ("int", str(rng.randint(0, 1)))
+        if rng.random() < 0.5:
+            return ("int", str(rng.randint(-1, 4)))
+        return self.symbol("int")
+    def stackStatement(self):
+        rng = self.rng
+        kind = rng.choice(["int", "int", "bool", "string"])
+        self.emit("PUSHS", self.symbol(kind))
+        self.emit("PUSHS", self.symbol(kind))
+        if kind == "int":
+            opcode = rng.choice(["ADDS", "SUBS", "MULS", "IDIVS", "LTS", "GTS", "EQS"])
+        elif kind == "bool":
+            opcode = rng.choice(["ANDS", "ORS", "EQS", "LTS"])
+        else:
+            opcode = rng.choice(["EQS", "GTS", "STRI2INTS"])
+            if opcode == "STRI2INTS":
+                self.code[-1] = ("PUSHS", [self.index()])
+        if opcode == "MULS":
+            self.code[-1] = ("PUSHS", [self.factor()])
+        self.emit(opcode)
+        result = "bool" if opcode in ("LTS", "GTS", "EQS", "ANDS", "ORS") else "int"
+        if rng.random() < 0.1:
+            self.emit("CLEARS")
+        else:
+            self.emit("POPS", self.destination(result))
+    def branch(self, depth, subroutine):
+        rng = self.rng
+        skip = self.label()
+        kind = rng.choice(["int", "string", "bool"])
+        if rng.random() < 0.2:
+            self.emit("PUSHS", self.symbol(kind))
+            self.emit("PUSHS", self.symbol(kind))
+            self.emit(rng.choice(["JUMPIFEQS", "JUMPIFNEQS"]), ("label", skip))
+        else:
+            self.emit(rng.choice(["JUMPIFEQ", "JUMPIFNEQ"]), ("label", skip), self.symbol(kind), self.symbol(kind))
+        self.block(rng.randint(1, 4), depth + 1, subroutine)
+        self.emit("LABEL", ("label", skip))
+    #cyklus s čítačem od 0 do pevné meze, výstupní test je JUMPIFEQ (nebo LT s JUMPIFEQ)
+    #tělo je občas jeden z idiomů, které umí provést findIdioms (součet, přidávání, kopírování a vyplňování)
+    def loop(self, depth, subroutine):
+        rng = self.rng
+        counter = ("var", "GF@c{}".format(self.counters))
+        self.counters += 1
+        head = self.label()
+        end = self.label()
+        idiom = rng.choice(["sum", "append", "copy", "fill"]) if rng.random() < 0.4 else None
+        #SETCHAR potřebuje krátkou smyčku, řetězce mají jen několik znaků
+        limit = ("int", str(rng.randint(0, 6 if idiom == "fill" else 40)))
+        self.emit("MOVE", counter, ("int", str(rng.choice([0, 0, 0, 1, 3]))))
+        self.emit("LABEL", ("label", head))
+        if rng.random() < 0.5:
+            self.emit("JUMPIFEQ", ("label", end), counter, limit)
+        else:
+            if rng.random() < 0.3 and idiom != "fill":
+                limit = self.var(intVars)
+            flag = ("var", "GF@c{}".format(self.counters))
+            self.counters += 1
+            #občas je příznakem sám čítač nebo mez, LT je pak přepíše na bool a smyčka skončí chybou 53
+            if rng.random() < 0.05:
+                flag = rng.choice([counter, limit]) if limit[0] == "var" else counter
+            self.emit("LT", flag, counter, limit)
+            self.emit("JUMPIFEQ", ("label", end), flag, ("bool", "false"))
+        if idiom is not None:
+            self.idiomBody(idiom, counter)
+        else:
+            self.block(rng.randint(1, 4), depth + 1, subroutine)
+        self.emit("ADD", counter, counter, ("int", "1"))
+        self.emit("JUMP", ("label", head))
+        self.emit("LABEL", ("label", end))
+    def idiomBody(self, kind, counter):
+        rng = self.rng
+        if kind == "sum":
+            target = self.var(intVars)
+            step = rng.choice([counter, self.intConst(), self.var(intVars)])
+            self.emit(rng.choice(["ADD", "SUB"]), target, target, step)
+        elif kind == "append":
+            target = self.var(stringVars)
+            self.emit("CONCAT", target, target, rng.choice([self.stringConst(), self.var(constantVars)]))
+        elif kind == "copy":
+            names = rng.sample(stringVars, 3)
+            source = ("var", names[1]) if rng.random() < 0.5 else ("string", "".join(rng.choice("abcXYZ") for i in range(45)))
+            self.emit("GETCHAR", ("var", names[0]), source, counter)
+            self.emit("CONCAT", ("var", names[2]), ("var", names[2]), ("var", names[0]))
+        else:
+            target = self.var(stringVars)
+            self.emit("SETCHAR", target, counter, self.symbol("string"))
+    def call(self, index):
+        if index in self.pureSubroutines:
+            self.emit("PUSHS", self.symbol("int"))
+            self.emit("CALL", ("label", "f{}".format(index)))
+            self.emit("POPS", self.destination("int"))
+        else:
+            self.emit("CALL", ("label", "f{}".format(index)))
+    #čistý podprogram: argument a výsledek předává přes datový zásobník a pracuje jen s LF
+    #ostatní podprogramy smí měnit globální proměnné, číst vstup a zapisovat výstup
+    def subroutine(self, index):
+        rng = self.rng
+        self.emit("LABEL", ("label", "f{}".format(index)))
+        self.emit("CREATEFRAME")
+        self.emit("PUSHFRAME")
+        if index in self.pureSubroutines:
+            self.emit("DEFVAR", ("var", "LF@x"))
+            self.emit("POPS", ("var", "LF@x"))
+            for i in range(rng.randint(1, 4)):
+                self.emit(rng.choice(["ADD", "SUB", "MUL"]), ("var", "LF@x"), ("var", "LF@x"), self.intConst())
+            self.emit("PUSHS", ("var", "LF@x"))
+        else:
+            self.block(rng.randint(1, 6), 1, index)
+        self.emit("POPFRAME")
+        self.emit("RETURN")
+
+    #vstup pro jeden běh: řádky odpovídají typům READ, občas neplatné nebo chybějící
+    def input(self):
+        rng = self.rng
+        lines = []
+        for kind in self.reads * rng.randint(1, 3):
+            choice = rng.random()
+            if choice < 0.03:
+                lines.append(rng.choice(["", "x1", "1.5", "TRUE"]))
+            elif kind == "int":
+                lines.append(str(rng.randint(-50, 50)))
+            elif kind == "bool":
+                lines.append(rng.choice(["true", "false", "True"]))
+            else:
+                lines.append("".join(rng.choice("abc XY\\é<") for i in range(rng.randint(0, 6))))
+        if rng.random() < 0.05:
+            del lines[rng.randint(0, len(lines)):]
+        return "".join(line + "\n" for line in lines)
+
+#XML podoba programu, pořadí instrukcí se čísluje od 1
+def toXml(code):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<program language="IPPcode23">']
+    for order, (opcode, args) in enumerate(code, 1):
+        text = "".join('<arg{0} type="{1}">{2}</arg{0}>'.format(i, kind, escape(value))
+                       for i, (kind, value) in enumerate(args, 1))
+        lines.append('<instruction order="{}" opcode="{}">{}</instruction>'.format(order, opcode, text))
+    lines.append("</program>")
+    return "\n".join(lines) + "\n"
+
+#vygeneruje případ (program, seznam vstupů) z čísla semínka
+def generateCase(seed, inputs):
+    rng = random.Random(seed)
+    generator = Generator(rng)
+    code = generator.program()
+    return code, [generator.input() for i in range(inputs)]
+
+#jeden běh interpretem, vrací dvojici (návratový kód, výstup)
+def runOne(program, inputText, maxInstructions, **options):
+    output = io.StringIO()
+    interpreter = Interpret(program, io.StringIO(inputText), output, errorFile = io.StringIO(), **options)
+    if maxInstructions is not None:
+        interpreter.periodic.append(Budget(maxInstructions).check)
+    try:
+        code = interpreter.run()
+    except IPPError as e:
+        code = e.code
+    except Exception as e:
+        #pád interpretu (výjimka mimo IPPError) je také výsledek, kandidát ho musí zopakovat
+        code = "crash {}".format(type(e).__name__)
+    return code, output.getvalue()
+
+def runReference(program, inputs, maxInstructions):
+    return [runOne(program, inputText, maxInstructions) for inputText in inputs]
+
+def runMemoize(program, inputs, maxInstructions):
+    memoizer = Memoizer(program, 64)
+    return [runOne(program, inputText, maxInstructions, memoizer = memoizer) for inputText in inputs]
+
+def runTrace(program, inputs, maxInstructions):
+    return [runOne(program, inputText, maxInstructions, trace = 16) for inputText in inputs]
+
+def runImage(program, inputs, maxInstructions):
+    from image import ImageProgram, buildImage
+    return runReference(ImageProgram(buildImage(program)), inputs, maxInstructions)
+
+def runIdioms(program, inputs, maxInstructions):
+    from idioms import findIdioms
+    idioms = findIdioms(program)
+    return [runOne(program, inputText, maxInstructions, idioms = idioms) for inputText in inputs]
+
+#vlákna na pozadí s malými dávkami, aby se výstup rozdělil do mnoha zápisů
+def runThreaded(program, inputs, maxInstructions):
+    from threadedio import PrefetchInput, BackgroundOutput
+    results = []
+    for inputText in inputs:
+        output = io.StringIO()
+        background = BackgroundOutput(output, batchSize = 8, queueSize = 2)
+        interpreter = Interpret(program, PrefetchInput(io.StringIO(inputText)), background, errorFile = io.StringIO())
+        if maxInstructions is not None:
+            interpreter.periodic.append(Budget(maxInstructions).check)
+        try:
+            try:
+                code = interpreter.run()
+            finally:
+                background.close()
+        except IPPError as e:
+            code = e.code
+        except Exception as e:
+            code = "crash {}".format(type(e).__name__)
+        results.append((code, output.getvalue()))
+    return results
+
+def runLockstep(program, inputs, maxInstructions):
+    from lockstep import runLockstep
+    return runLockstep(program, [io.StringIO(inputText) for inputText in inputs])
+
+#kandidáti: funkce (program, vstupy, limit instrukcí) -> seznam dvojic (návratový kód, výstup)
+#program dostane každý kandidát nově naparsovaný, aby si kandidáti nesdíleli stav
+candidates = {
+    "memoize": runMemoize,
+    "trace": runTrace,
+    "lockstep": runLockstep,
+    "image": runImage,
+    "idioms": runIdioms,
+    "threaded": runThreaded,
+}
+
+#výsledek porovnání případu: None při shodě, jinak popis neshody (reference, kandidát)
+#případy, které referenčnímu interpretu nestačí na limit instrukcí, se nepočítají (vrací None),
+#a pokud referenční interpret spadne mimo IPPError, kandidáta nemá s čím porovnat (vrací referenceCrash)
+referenceCrash = "reference crash"
+
+def compare(candidate, code, inputs, maxInstructions):
+    xml = toXml(code)
+    try:
+        reference = runReference(parseProgram(xml), inputs, maxInstructions)
+    except IPPError:
+        #program, který nejde ani načíst (např. po odebrání návěští při minimalizaci), se nezkoumá
+        return None
+    if any(result[0] == 59 for result in reference):
+        return None
+    if any(type(result[0]) == str for result in reference):
+        return referenceCrash
+    try:
+        result = candidates[candidate](parseProgram(xml), inputs, maxInstructions)
+    except ImportError:
+        raise
+    except IPPError as e:
+        result = [(e.code, "")] * len(inputs)
+    except Exception:
+        result = traceback.format_exc()
+    if result == reference:
+        return None
+    return reference, result
+
+#minimalizace neshodného případu: postupně odebírá bloky instrukcí (od velkých po jednotlivé),
+#pak celé vstupy a řádky vstupů, změna se ponechá, jen když se neshoda drží
+def minimize(candidate, code, inputs, maxInstructions):
+    def fails(code, inputs):
+        return type(compare(candidate, code, inputs, maxInstructions)) == tuple
+    size = len(code) // 2
+    while size >= 1:
+        start = 0
+        while start < len(code):
+            smaller = code[:start] + code[start + size:]
+            if smaller and fails(smaller, inputs):
+                code = smaller
+            else:
+                start += size
+        size //= 2
+    index = 0
+    while len(inputs) > 1 and index < len(inputs):
+        smaller = inputs[:index] + inputs[index + 1:]
+        if fails(code, smaller):
+            inputs = smaller
+        else:
+            index += 1
+    for index in range(len(inputs)):
+        lines = inputs[index].splitlines(True)
+        line = 0
+        while line < len(lines):
+            smaller = lines[:line] + lines[line + 1:]
+            if fails(code, inputs[:index] + ["".join(smaller)] + inputs[index + 1:]):
+                lines = smaller
+            else:
+                line += 1
+        inputs = inputs[:index] + ["".join(lines)] + inputs[index + 1:]
+    return code, inputs
+
+#stderr workerů se zahazuje, ladicí instrukce a chybová hlášení by zaplavila výstup
+def initWorker():
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 2)
+
+#úloha workeru: vygeneruje případ, porovná a případně minimalizuje
+#vrací (semínko, kandidát, None), (semínko, kandidát, referenceCrash), (semínko, kandidát, "unavailable: ...")
+#nebo (semínko, kandidát, (xml, vstupy, reference, výsledek))
+def runCase(task):
+    seed, candidate, inputs, maxInstructions, shrink = task
+    code, inputTexts = generateCase(seed, inputs)
+    try:
+        mismatch = compare(candidate, code, inputTexts, maxInstructions)
+    except ImportError as e:
+        return seed, candidate, "unavailable: {}".format(e)
+    if mismatch is None or mismatch == referenceCrash:
+        return seed, candidate, mismatch
+    if shrink:
+        code, inputTexts = minimize(candidate, code, inputTexts, maxInstructions)
+        smaller = compare(candidate, code, inputTexts, maxInstructions)
+        if type(smaller) == tuple:
+            mismatch = smaller
+    return seed, candidate, (toXml(code), inputTexts) + mismatch
+
+#vypíše neshodný případ a volitelně ho uloží do adresáře (program.xml a vstupy inN)
+def report(seed, candidate, failure, out):
+    xml, inputs, reference, result = failure
+    print("=== neshoda: kandidát {}, semínko {}".format(candidate, seed))
+    print(xml, end = "")
+    for index, inputText in enumerate(inputs):
+        print("--- vstup {}: {!r}".format(index, inputText))
+        if isinstance(result, str):
+            continue
+        print("    reference: kód {} výstup {!r}".format(*reference[index]))
+        print("    kandidát:  kód {} výstup {!r}".format(*result[index]))
+    if isinstance(result, str):
+        print("--- kandidát spadl:")
+        print(result, end = "")
+    if out:
+        directory = os.path.join(out, "{}-{}".format(candidate, seed))
+        os.makedirs(directory, exist_ok = True)
+        with open(os.path.join(directory, "program.xml"), "w") as fp:
+            fp.write(xml)
+        for index, inputText in enumerate(inputs):
+            with open(os.path.join(directory, "in{}".format(index)), "w") as fp:
+                fp.write(inputText)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", type = int, default = 500)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--jobs", type = int, default = os.cpu_count() or 1)
+    parser.add_argument("--candidates", default = ",".join(candidates))
+    parser.add_argument("--inputs", type = int, default = 4)
+    parser.add_argument("--max-instructions", type = int, default = 200000)
+    parser.add_argument("--out", default = None)
+    parser.add_argument("--no-minimize", action = "store_true")
+    args = parser.parse_args()
+
+    names = [name for name in args.candidates.split(",") if name]
+    for name in names:
+        if name not in candidates:
+            parser.error("neznámý kandidát {} (dostupné: {})".format(name, ", ".join(candidates)))
+    tasks = [(args.seed + i, name, args.inputs, args.max_instructions, not args.no_minimize)
+             for i in range(args.cases) for name in names]
+
+    import multiprocessing
+    failures = 0
+    crashes = set()
+    unavailable = set()
+    with multiprocessing.Pool(max(1, args.jobs), initializer = initWorker) as pool:
+        for seed, candidate, failure in pool.imap_unordered(runCase, tasks, chunksize = 4):
+            if failure is None:
+                continue
+            if failure == referenceCrash:
+                crashes.add(seed)
+                continue
+            if isinstance(failure, str):
+                if candidate not in unavailable:
+                    unavailable.add(candidate)
+                    print("kandidát {} přeskočen ({})".format(candidate, failure))
+                continue
+            failures += 1
+            report(seed, candidate, failure, args.out)
+    tested = [name for name in names if name not in unavailable]
+    if crashes:
+        print("referenční interpret spadl mimo IPPError u {} případů (semínka {}), ty se neporovnávají".format(
+              len(crashes), ", ".join(str(seed) for seed in sorted(crashes))))
+    print("{} případů, kandidáti: {}, neshod: {}".format(args.cases, ", ".join(tested) or "žádní", failures))
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+#hromadné provádění jednoduchých smyček s čítačem (volba --idioms)
+
+from interpret import IPPError, getValue
+
+#rozpoznávání smyček s čítačem, které lze nahradit jednou hromadnou operací
+#smyčka má tvar
+#  LABEL head; JUMPIFEQ end i n (nebo LT f i n; JUMPIFEQ end f bool@false); tělo; ADD i i int@1; JUMP head; LABEL end
+#a tělo je jedna z forem (x je konstanta nebo proměnná, kterou smyčka nemění):
+#  sum:    ADD acc acc x nebo SUB acc acc x (x může být i sám čítač i)
+#  append: CONCAT s s x
+#  copy:   GETCHAR ch src i; CONCAT dst dst ch
+#  fill:   SETCHAR s i x
+#run() ověří typy a meze hodnot a výsledek spočítá najednou, jinak vrátí False a smyčka proběhne normálně
+#(i tehdy, když by některá iterace skončila chybou, ta se tak ohlásí ve stejném stavu jako bez idiomů)
+class LoopIdiom:
+    def __init__(self, kind, counter, limit, flag, body, exitPc, length):
+        self.kind = kind
+        self.counter = counter
+        self.limit = limit
+        self.flag = flag
+        self.body = body
+        self.exitPc = exitPc
+        #počet instrukcí výstupního testu a těla, kvůli počítadlu provedených instrukcí
+        self.testLength = 1 if flag is None else 2
+        self.bodyLength = length
+    #hodnota operandu: proměnná z paměti, konstanta stejně jako v obslužné funkci instrukce
+    def value(self, memory, arg):
+        if arg.type == "var":
+            return memory.get(arg.name)
+        return getValue(arg)
+    def run(self, interpreter):
+        memory = interpreter.memory
+        try:
+            start = memory.get(self.counter)
+            limit = self.value(memory, self.limit)
+            if self.flag is not None:
+                memory.get(self.flag)
+            if type(start) != int or type(limit) != int:
+                return False
+            count = limit - start
+            if count <= 0:
+                return False
+            updates = getattr(self, self.kind)(memory, start, limit, count)
+        except IPPError:
+            return False
+        if updates is None:
+            return False
+        for name, value in updates:
+            memory.set(name, value)
+        memory.set(self.counter, limit)
+        if self.flag is not None:
+            memory.set(self.flag, False)
+        #LABEL hlavy smyčky započítá interpret sám
+        interpreter.executed += (count + 1) * (1 + self.testLength) + count * (self.bodyLength + 2) - 1
+        interpreter.pc = self.exitPc
+        return True
+    def sum(self, memory, start, limit, count):
+        opcode, target, step = self.body
+        total = memory.get(target)
+        if step.type == "var" and step.name == self.counter:
+            amount = (start + limit - 1) * count // 2
+        else:
+            value = self.value(memory, step)
+            if type(value) != int:
+                return None
+            amount = value * count
+        if type(total) != int:
+            return None
+        return [(target, total + amount if opcode == "ADD" else total - amount)]
+    def append(self, memory, start, limit, count):
+        target, suffix = self.body
+        text = memory.get(target)
+        value = memory.get(suffix.name) if suffix.type == "var" else suffix.name
+        if type(text) != str or type(value) != str:
+            return None
+        return [(target, text + value * count)]
+    def copy(self, memory, start, limit, count):
+        char, source, target = self.body
+        text = self.value(memory, source)
+        result = memory.get(target)
+        memory.get(char)
+        if type(text) != str or type(result) != str or start < 0 or limit > len(text):
+            return None
+        return [(char, text[limit - 1]), (target, result + text[start:limit])]
+    def fill(self, memory, start, limit, count):
+        target, fill = self.body
+        text = memory.get(target)
+        value = self.value(memory, fill)
+        if type(text) != str or type(value) != str or value == "" or start < 0 or limit > len(text):
+            return None
+        return [(target, text[:start] + value[0] * count + text[limit:])]
+
+#najde všechny rozpoznatelné smyčky programu, vrací slovník pc návěští hlavy -> LoopIdiom
+def findIdioms(program):
+    labels = program.link()
+    ins = program.ins
+    idioms = dict()
+    def isVar(arg, name = None):
+        return arg.type == "var" and (name is None or arg.name == name)
+    def isConstant(arg, kind):
+        if arg.type != kind:
+            return False
+        try:
+            getValue(arg)
+        except Exception:
+            return False
+        return True
+    def shape(instruction, opcode, count):
+        return instruction.opcode == opcode and len(instruction.arg) == count
+    for index in range(len(ins)):
+        head = ins[index]
+        if not shape(head, "LABEL", 1) or index + 1 >= len(ins):
+            continue
+        test = ins[index + 1]
+        flag = None
+        if shape(test, "JUMPIFEQ", 3) and index + 2 < len(ins):
+            exitLabel = test.arg[0]
+            operands = test.arg[1:]
+            bodyStart = index + 2
+        elif shape(test, "LT", 3) and index + 2 < len(ins) and shape(ins[index + 2], "JUMPIFEQ", 3):
+            jump = ins[index + 2]
+            if not isVar(test.arg[0]) or not isVar(jump.arg[1], test.arg[0].name) or \
+               jump.arg[2].type != "bool" or jump.arg[2].name != "false":
+                continue
+            flag = test.arg[0].name
+            exitLabel = jump.arg[0]
+            operands = test.arg[1:]
+            bodyStart = index + 3
+        else:
+            continue
+        #konec smyčky: ADD i i int@1; JUMP head; LABEL end
+        if exitLabel.type != "label" or labels.get(exitLabel.name) is None:
+            continue
+        endIndex = labels[exitLabel.name] - 1
+        if endIndex - 3 < bodyStart:
+            continue
+        increment, back = ins[endIndex - 2], ins[endIndex - 1]
+        if not shape(increment, "ADD", 3) or not shape(back, "JUMP", 1) or \
+           back.arg[0].type != "label" or back.arg[0].name != head.arg[0].name:
+            continue
+        if not isVar(increment.arg[0]) or not isVar(increment.arg[1], increment.arg[0].name) or \
+           increment.arg[2].type != "int" or increment.arg[2].name != "1":
+            continue
+        counter = increment.arg[0].name
+        if flag is None and isVar(operands[1], counter):
+            operands = operands[::-1]
+        if not isVar(operands[0], counter) or not (isVar(operands[1]) or isConstant(operands[1], "int")):
+            continue
+        limit = operands[1]
+        #LT přepisuje příznak, ten tedy nesmí být čítačem ani mezí (LT by je změnil na bool a ADD skončil chybou)
+        if flag is not None and (flag == counter or (isVar(limit) and flag == limit.name)):
+            continue
+        fixed = {counter, flag, limit.name if isVar(limit) else None}
+        body = ins[bodyStart:endIndex - 2]
+        idiom = None
+        if len(body) == 1 and body[0].opcode in ("ADD", "SUB") and len(body[0].arg) == 3:
+            target, first, step = body[0].arg
+            if isVar(target) and isVar(first, target.name) and target.name not in fixed and \
+               (isConstant(step, "int") or (isVar(step) and step.name not in (target.name, flag))):
+                idiom = ("sum", (body[0].opcode, target.name, step))
+        elif len(body) == 1 and shape(body[0], "CONCAT", 3):
+            target, first, suffix = body[0].arg
+            if isVar(target) and isVar(first, target.name) and target.name not in fixed and \
+               ((suffix.type == "string" and suffix.name is not None) or
+                (isVar(suffix) and suffix.name not in fixed and suffix.name != target.name)):
+                idiom = ("append", (target.name, suffix))
+        elif len(body) == 2 and shape(body[0], "GETCHAR", 3) and shape(body[1], "CONCAT", 3):
+            char, source, position = body[0].arg
+            target, first, second = body[1].arg
+            if isVar(char) and isVar(position, counter) and isVar(target) and isVar(first, target.name) and \
+               isVar(second, char.name) and (isConstant(source, "string") or isVar(source)):
+                names = [char.name, target.name] + ([source.name] if isVar(source) else [])
+                if len(set(names)) == len(names) and not set(names) & fixed:
+                    idiom = ("copy", (char.name, source, target.name))
+        elif len(body) == 1 and shape(body[0], "SETCHAR", 3):
+            target, position, fill = body[0].arg
+            if isVar(target) and isVar(position, counter) and target.name not in fixed and \
+               (isConstant(fill, "string") or (isVar(fill) and fill.name not in fixed and fill.name != target.name)):
+                idiom = ("fill", (target.name, fill))
+        if idiom is not None:
+            idioms[index + 1] = LoopIdiom(idiom[0], counter, limit, flag, idiom[1], endIndex + 1, len(body))
+    return idioms
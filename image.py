@@ -0,0 +1,153 @@
+#plochý obraz programu pro spouštění dávek ze sdílené paměti (volba --image)
+
+import struct
+
+from interpret import Instruction, Argument, IPPError, SourceError, findBlocks
+
+#plochý obraz programu (bytes) pro sdílení mezi procesy, např. ve sdílené paměti
+#obsahuje jen relativní pozice, takže funguje na libovolné adrese, všechna čísla jsou little-endian:
+#  hlavička: imageMagic, počty instrukcí, argumentů, návěští, použitých opcodů a řetězců, index otisku
+#  instrukce: order, index opcodu v Instruction.opcodes, počet argumentů, index prvního argumentu
+#  argumenty: index typu v Argument.types, index řetězce s hodnotou (noneString pro None)
+#  návěští: index řetězce s názvem, cíl skoku (pozice v programu od 1, stejně jako Program.link())
+#  použité opcody: indexy v Instruction.opcodes
+#  řetězce: tabulka konců jednotlivých řetězců a za ní jejich UTF-8 data za sebou
+imageMagic = b"IPPI1\n"
+imageHeader = "<6s2x6I"
+imageInstruction = "<qHHI"
+imageArgument = "<HxxI"
+imageLabel = "<II"
+noneString = 0xFFFFFFFF
+
+#sestaví obraz z načteného programu, program musí jít slinkovat (chyby se šíří jako IPPError)
+#program, který se do formátu obrazu nevejde (např. order mimo 64 bitů), skončí také chybou IPPError
+def buildImage(program):
+    labels = program.link()
+    try:
+        return packImage(program, labels)
+    except (struct.error, OverflowError) as e:
+        raise IPPError("program does not fit the image format {}".format(e))
+
+#zakóduje program se slinkovanou tabulkou návěští do obrazu (formát viz výše)
+def packImage(program, labels):
+    strings = dict()
+    def string(text):
+        if text is None:
+            return noneString
+        return strings.setdefault(text, len(strings))
+    opcodeIndex = {opcode: i for i, opcode in enumerate(Instruction.opcodes)}
+    typeIndex = {kind: i for i, kind in enumerate(Argument.types)}
+    instructions = []
+    arguments = []
+    for ins in program.ins:
+        instructions.append(struct.pack(imageInstruction, ins.order, opcodeIndex[ins.opcode], len(ins.arg), len(arguments)))
+        for arg in ins.arg:
+            arguments.append(struct.pack(imageArgument, typeIndex[arg.type], string(arg.name)))
+    labelTable = [struct.pack(imageLabel, string(name), target) for name, target in labels.items()]
+    used = sorted(opcodeIndex[opcode] for opcode in program.opcodesUsed)
+    fingerprint = string(program.fingerprint())
+    data = [text.encode() for text in strings]
+    ends = []
+    end = 0
+    for item in data:
+        end += len(item)
+        ends.append(end)
+    return b"".join([struct.pack(imageHeader, imageMagic, len(instructions), len(arguments), len(labelTable),
+                                 len(used), len(data), fingerprint)] +
+                    instructions + arguments + labelTable +
+                    [struct.pack("<{}H".format(len(used)), *used), struct.pack("<{}I".format(len(ends)), *ends)] + data)
+
+#program spouštěný přímo z obrazu (bytes, memoryview nebo buffer sdílené paměti) bez kopírování
+#instrukce se dekódují až při prvním přístupu a pak se pamatují, tabulka návěští je v obrazu předpočítaná
+#rozhraní je stejné jako u třídy Program (ins, link(), fingerprint(), opcodesUsed)
+class ImageProgram:
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer)
+        try:
+            magic, self.insCount, argCount, labelCount, usedCount, stringCount, fingerprint = \
+                struct.unpack_from(imageHeader, self.buffer, 0)
+        except struct.error as e:
+            raise SourceError("wrong program image {}".format(e))
+        if magic != imageMagic:
+            raise SourceError("wrong program image")
+        self.instructionStruct = struct.Struct(imageInstruction)
+        self.argumentStruct = struct.Struct(imageArgument)
+        self.insOffset = struct.calcsize(imageHeader)
+        self.argOffset = self.insOffset + self.insCount * self.instructionStruct.size
+        self.labelOffset = self.argOffset + argCount * self.argumentStruct.size
+        self.labelCount = labelCount
+        usedOffset = self.labelOffset + labelCount * struct.calcsize(imageLabel)
+        self.endsOffset = usedOffset + 2 * usedCount
+        self.dataOffset = self.endsOffset + 4 * stringCount
+        self.opcodesUsed = {Instruction.opcodes[i] for i in struct.unpack_from("<{}H".format(usedCount), self.buffer, usedOffset)}
+        self.arguments = dict()
+        self.ins = ImageInstructions(self)
+        self.labels = None
+        self.blockStops = None
+        self.fingerprintHash = self.string(fingerprint)
+    #řetězec z tabulky řetězců obrazu
+    def string(self, index):
+        if index == noneString:
+            return None
+        start = 0
+        if index > 0:
+            start = int.from_bytes(self.buffer[self.endsOffset + 4 * (index - 1):self.endsOffset + 4 * index], "little")
+        end = int.from_bytes(self.buffer[self.endsOffset + 4 * index:self.endsOffset + 4 * index + 4], "little")
+        return str(self.buffer[self.dataOffset + start:self.dataOffset + end], "utf-8")
+    def fingerprint(self):
+        return self.fingerprintHash
+    def link(self):
+        if self.labels is None:
+            labels = dict()
+            for name, target in struct.iter_unpack(imageLabel, self.buffer[self.labelOffset:self.labelOffset + 8 * self.labelCount]):
+                labels[self.string(name)] = target
+            self.labels = labels
+        return self.labels
+    def blocks(self):
+        if self.blockStops is None:
+            self.blockStops = findBlocks(self)
+        return self.blockStops
+    #dekóduje jednu instrukci obrazu, stejné argumenty (typ a hodnota) sdílí všechny instrukce
+    def instruction(self, index):
+        order, opcode, argCount, firstArg = self.instructionStruct.unpack_from(
+            self.buffer, self.insOffset + index * self.instructionStruct.size)
+        args = []
+        for i in range(argCount):
+            key = self.argumentStruct.unpack_from(self.buffer, self.argOffset + (firstArg + i) * self.argumentStruct.size)
+            arg = self.arguments.get(key)
+            if arg is None:
+                arg = self.arguments[key] = ImageArgument(Argument.types[key[0]], self.string(key[1]))
+            args.append(arg)
+        return ImageInstruction(order, Instruction.opcodes[opcode], tuple(args))
+
+#dekódovaná instrukce a argument obrazu, mají stejné atributy jako Instruction a Argument,
+#ale zabírají méně paměti (na rozdíl od nich se nemění, takže je lze sdílet)
+class ImageInstruction:
+    __slots__ = ("order", "opcode", "arg")
+    def __init__(self, order, opcode, arg):
+        self.order = order
+        self.opcode = opcode
+        self.arg = arg
+class ImageArgument:
+    __slots__ = ("type", "name")
+    def __init__(self, type, name):
+        self.type = type
+        self.name = name
+
+#seznam instrukcí obrazu: ins[i] dekóduje instrukci při prvním přístupu, nepoužité instrukce zůstávají jen v obrazu
+class ImageInstructions:
+    def __init__(self, image):
+        self.image = image
+        self.decoded = [None] * image.insCount
+    def __len__(self):
+        return len(self.decoded)
+    def __getitem__(self, index):
+        ins = self.decoded[index]
+        if ins is None:
+            if index < 0:
+                index += len(self.decoded)
+            ins = self.decoded[index] = self.image.instruction(index)
+        return ins
+    def __iter__(self):
+        for index in range(len(self.decoded)):
+            yield self[index]
@@ -2,33 +2,135 @@
 #login: xpries01
 
 
-import re
-import argparse
-import xml.etree.ElementTree as ET
-from sys import stderr, stdin, exit
+import io
+import os
+from sys import stderr, stdin, stdout, exit
+
+#ostatní moduly (argparse, re, xml.etree, multiprocessing, ...) se importují až ve funkcích,
+#které je potřebují, aby krátké programy neplatily při startu za nepoužité importy
+#ze stejného důvodu jsou rozšíření v samostatných modulech (batch, server, sessions, image, memoize, idioms,
+#checkpoint, budget, threadedio, lockstep), které main() importuje až při použití příslušné volby,
+#takže se při jednorázovém spuštění programu ani nekompilují
+
+#chyby interpretu, každá nese návratový kód podle zadání IPPcode23
+#interpret při chybě nevolá exit(), ale vyhodí výjimku, kterou zpracuje až volající (např. CLI)
+class IPPError(Exception):
+    code = 99
+    def __init__(self, message, code = None):
+        super().__init__(message)
+        if code is not None:
+            self.code = code
+#chybějící nebo nečitelný vstupní soubor, chybný formát XML
+class SourceError(IPPError):
+    code = 31
+#neočekávaná struktura XML, chybný opcode nebo argumenty instrukce
+class StructureError(IPPError):
+    code = 32
+#sémantická chyba (redefinice proměnné nebo návěští, neznámé návěští)
+class SemanticError(IPPError):
+    code = 52
+#špatné typy operandů
+class OperandTypeError(IPPError):
+    code = 53
+#přístup k neexistující proměnné
+class VariableError(IPPError):
+    code = 54
+#rámec neexistuje
+class FrameError(IPPError):
+    code = 55
+#chybějící hodnota (prázdný zásobník)
+class MissingValueError(IPPError):
+    code = 56
+#špatná hodnota operandu (dělení nulou, špatný návratový kód)
+class OperandValueError(IPPError):
+    code = 57
+#chybná práce s řetězcem
+class StringError(IPPError):
+    code = 58
+
+#překročení limitu výpočtu (třída Budget), kód 59 není v zadání IPPcode23 obsazen
+class BudgetError(IPPError):
+    code = 59
+
+#ukončení programu instrukcí EXIT, není to chyba
+class ProgramExit(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
 
 #vnitřní reprezentace načteného zdrojového kódu
 #konstruktor vyžaduje kořenový element zdrojové XML struktury
-#obsahuje jedinou proměnnou self.ins, což je seznam instrukcí programu. -instance třídy Instruction
+#obsahuje proměnnou self.ins, což je seznam instrukcí programu. -instance třídy Instruction
+#a tabulku návěští self.labels, kterou sestaví funkce link()
 #Provadí nezbytný preprocesing např.: kontrolu orderu a seřazení atd.
 #parsování vnitřních XML elemntu deleguje na třídu Instruction
 
 class Program:
     def __init__(self, xmlRoot):
         if xmlRoot.attrib.get('language').lower() != 'IPPcode23'.lower():
-            stderr.write("wrong header")
-            exit(32)
+            raise StructureError("wrong header")
         if xmlRoot.tag != 'program':
-            stderr.write("missing program")
-            exit(32)
+            raise StructureError("missing program")
         self.ins = []
         for instruction in xmlRoot:
             self.ins.append(Instruction(instruction))
         self.ins = sorted(self.ins, key = lambda x:x.order)
         for i in range(len(self.ins )-1):
             if self.ins[i].order == self.ins[i+1].order:
-                stderr.write("duplikatni order")
-                exit(32)
+                raise StructureError("duplikatni order")
+        #množina použitých opcodů, podle ní interpret vybírá smyčku (např. počítání instrukcí kvůli BREAK)
+        self.opcodesUsed = {ins.opcode for ins in self.ins}
+        self.labels = None
+        self.fingerprintHash = None
+        self.blockStops = None
+    #otisk programu (hash instrukcí a jejich argumentů), podle kterého se pozná, ke kterému programu patří snapshot
+    def fingerprint(self):
+        if self.fingerprintHash is None:
+            import hashlib
+            import marshal
+            code = [(ins.order, ins.opcode, [(arg.type, arg.name) for arg in ins.arg]) for ins in self.ins]
+            self.fingerprintHash = hashlib.sha256(marshal.dumps(code)).hexdigest()
+        return self.fingerprintHash
+    #projde program a načte všechna návěští
+    #tabulka se sestaví jen jednou a sdílí se mezi všemi běhy téhož programu
+    def link(self):
+        if self.labels is not None:
+            return self.labels
+        labels = dict()
+        for i in range(len(self.ins)):
+            if self.ins[i].opcode == "LABEL":
+                if len(self.ins[i].arg) != 1:
+                    raise StructureError("spatny pocet arg11 {}".format(self.ins[i].arg))
+                if self.ins[i].arg[0].type != "label":
+                    raise OperandTypeError("spatny typ arg")
+                if self.ins[i].arg[0].name in labels:
+                    raise SemanticError("stejne pojmenovani navesti")
+                labels[self.ins[i].arg[0].name] = i+1
+        self.labels = labels
+        return labels
+    #konce základních bloků (viz findBlocks), stejně jako návěští se počítají jen jednou
+    def blocks(self):
+        if self.blockStops is None:
+            self.blockStops = findBlocks(self)
+        return self.blockStops
+
+#základní bloky programu pro smyčku, která počítá provedené instrukce
+#vrací seznam, kde pro pc je na indexu pc pozice poslední instrukce bloku, který od pc pokračuje
+#blok končí instrukcí, která může skočit jinam (skoky, CALL, RETURN, EXIT, LABEL kvůli idiomům),
+#nebo před LABEL (cíl skoku) a BREAK (vypisuje počet provedených instrukcí, musí ho mít aktuální)
+blockEnds = frozenset(("JUMP", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS", "CALL", "RETURN", "EXIT", "LABEL"))
+blockStarts = frozenset(("LABEL", "BREAK"))
+
+def findBlocks(program):
+    ins = program.ins
+    count = len(ins)
+    stops = [0] * (count + 1)
+    for pc in range(count, 0, -1):
+        if pc == count or ins[pc - 1].opcode in blockEnds or ins[pc].opcode in blockStarts:
+            stops[pc] = pc
+        else:
+            stops[pc] = stops[pc + 1]
+    return stops
 
 #reprezentuje jednu instrukci ze zdrojového kódu
 #ověřuje a načítá atributy elementu instruction 
@@ -40,23 +142,21 @@ class Instruction:
                'RETURN', 'PUSHS', 'POPS', 'ADD', 'SUB', 'MUL', 'IDIV', 'LT', 'GT', 
                'EQ', 'AND', 'OR', 'NOT', 'INT2CHAR', 'STRI2INT', 'READ', 'WRITE', 
                'CONCAT', 'STRLEN', 'GETCHAR', 'SETCHAR', 'TYPE', 'LABEL', 'JUMP', 
-               'JUMPIFEQ', 'JUMPIFNEQ', 'EXIT', 'DPRINT', 'BREAK']
+               'JUMPIFEQ', 'JUMPIFNEQ', 'EXIT', 'DPRINT', 'BREAK',
+               'CLEARS', 'ADDS', 'SUBS', 'MULS', 'IDIVS', 'LTS', 'GTS', 'EQS', 'ANDS',
+               'ORS', 'NOTS', 'INT2CHARS', 'STRI2INTS', 'JUMPIFEQS', 'JUMPIFNEQS']
     def __init__(self, xml):
         try:
             self.order = int(xml.attrib.get('order'))
         except Exception as e:
-            stderr.write("wrong order {}".format(e))
-            exit(32)
+            raise StructureError("wrong order {}".format(e))
         if xml.tag != "instruction":
-            stderr.write("chybi instruction")
-            exit(32)
+            raise StructureError("chybi instruction")
         if self.order <= 0:
-            stderr.write("negative order {}".format(self.order))
-            exit(32)
+            raise StructureError("negative order {}".format(self.order))
         self.opcode = xml.attrib.get('opcode', "").upper()
         if not self.opcode in self.opcodes:
-            stderr.write("wrong instruction {}".format(self.opcode))
-            exit(32)
+            raise StructureError("wrong instruction {}".format(self.opcode))
         self.arg = []
         for argument in xml:
             self.arg.append(Argument(argument))
@@ -64,8 +164,7 @@ class Instruction:
         i = 1
         for arg in self.arg:
             if arg.argNum != i:
-                stderr.write("wrong sorted argNum")
-                exit(32)
+                raise StructureError("wrong sorted argNum")
             i+=1
 
 
@@ -73,28 +172,22 @@ class Argument:
     types = ['var', 'label', 'int', 'bool', 'string', 'type', 'nil']
     def __init__(self, xml):
         if not xml.tag.startswith('arg'):
-            stderr.write("not start with arg")
-            exit(32)
+            raise StructureError("not start with arg")
         try:
             self.argNum = int(xml.tag[3:])
         except Exception as e:
-            stderr.write("wrong arg number {}".format(e))
-            exit(32)
+            raise StructureError("wrong arg number {}".format(e))
         if not self.argNum in [1,2,3]:
-            stderr.write("wrong arg number 2: {}\n".format(self.argNum))
-            exit(32)
+            raise StructureError("wrong arg number 2: {}\n".format(self.argNum))
         try:
             self.type = xml.attrib.get('type')
         except Exception as e:
-            stderr.write("missing type {}".format(e))
-            exit(32)
+            raise StructureError("missing type {}".format(e))
         if not self.type in self.types:
-            stderr.write("wrong type {}".format(self.type))
-            exit(32)
+            raise StructureError("wrong type {}".format(self.type))
         self.name = xml.text
-        
 
-    
+
 #reprezentuje jeden frame v paměti
 #proměnné si ukládá formou slovníku, kde klíč je název proměnné a hodnota je hodnota proměnné
 class Frame:
@@ -106,14 +199,12 @@ class Frame:
     #funkce pro definici promněnné
     def defVar(self,name):
         if name in self.vars:
-            stderr.write("already existing variable {}".format(name))
-            exit(52)
+            raise SemanticError("already existing variable {}".format(name))
         self.vars[name] = None
     #funkce pro změnu hodnoty proměnné
     def set(self, name, value):
         if name not in self.vars:
-            stderr.write("setting non existing variable {}".format(name))
-            exit(54)
+            raise VariableError("setting non existing variable {}".format(name))
         self.vars[name] = value
     #funkce, která zjišťuje existenci proměnné
     def exists(self, name):
@@ -140,11 +231,11 @@ class Memory:
             elif frame == "LF":
                 return self.localFrames[-1].get(name[1])
             else:
-                stderr.write("wrong frame {}".format(name[0]))
-                exit(54)
+                raise VariableError("wrong frame {}".format(name[0]))
+        except IPPError:
+            raise
         except Exception as e:
-            stderr.write("undefined frame {}".format(e))
-            exit(55)
+            raise FrameError("undefined frame {}".format(e))
     #funkce pro změnu hodnoty proměnné
     def set(self, varName, value):
         name = varName.split("@")
@@ -157,11 +248,11 @@ class Memory:
             elif frame == "LF":
                 return self.localFrames[-1].set(name[1], value)
             else:
-                stderr.write("wrong frame {}".format(name[0]))
-                exit(54)
+                raise VariableError("wrong frame {}".format(name[0]))
+        except IPPError:
+            raise
         except Exception as e:
-            stderr.write("undefined frame {}".format(e))
-            exit(55)
+            raise FrameError("undefined frame {}".format(e))
     #funkce pro definici promněnné
     def defVar(self, varName):
         name = varName.split("@")
@@ -174,121 +265,199 @@ class Memory:
             elif frame == "LF":
                 return self.localFrames[-1].defVar(name[1])
             else:
-                stderr.write("wrong frame {}".format(name[0]))
-                exit(54)
+                raise VariableError("wrong frame {}".format(name[0]))
+        except IPPError:
+            raise
         except Exception as e:
-            stderr.write("undefined frame {}".format(e))
-            exit(55)
+            raise FrameError("undefined frame {}".format(e))
             
+#bufferovaný výstup ladicích instrukcí (DPRINT, BREAK) a stopy běhu
+#text se hromadí v seznamu a do souboru (výchozí je stderr) se zapíše až při flush()
+#nebo po překročení limitu, takže častý DPRINT nezpomaluje interpretaci zápisy do stderr
+class BufferedSink:
+    def __init__(self, file = None, limit = 65536):
+        self.file = file if file is not None else stderr
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.limit:
+            self.flush()
+    def flush(self):
+        if self.parts:
+            self.file.write("".join(self.parts))
+            self.parts = []
+            self.size = 0
+        self.file.flush()
+
+#textová podoba hodnoty pro ladicí výpisy ve tvaru typ@hodnota
+def renderValue(value):
+    if value is None:
+        return "nil@nil"
+    if type(value) == bool:
+        return "bool@true" if value else "bool@false"
+    if type(value) == int:
+        return "int@{}".format(value)
+    return "string@{}".format(value)
+
 #top-level třída: definuje vnější rozhraní interpretu 
-#v konstruktoru projde program a načte všechna návěští 
-#interpretace programu se spouští skrz funkci run()
+#v konstruktoru si od programu vyžádá tabulku návěští 
+#interpretace programu se spouští skrz funkci run(), jeden program lze spustit opakovaně
+#s různými vstupy (inputFile) a výstupy (outputFile, výchozí je stdout)
+#volitelný memoizer (instance třídy memoize.Memoizer) zapíná memoizaci volání čistých podprogramů
+#DPRINT a BREAK píší do bufferovaného errorFile (výchozí je stderr), trace=N zapíná stopu
+#posledních N provedených instrukcí, která se vypíše při nenulovém návratovém kódu nebo chybě
+#idioms (výsledek idioms.findIdioms) zapíná hromadné provedení rozpoznaných smyček, kontroluje se na jejich LABEL
+#(stopa běhu pak přeskočené iterace neobsahuje, počítadlo provedených instrukcí je zahrnuje)
 class Interpret:
-    def __init__(self, program, inputFile):
+    #názvy funkcí, které provádějí jednotlivé instrukce
+    handlerNames = {'MOVE': 'move', 'CREATEFRAME': 'createFrame', 'PUSHFRAME': 'pushFrame',
+                    'POPFRAME': 'popFrame', 'DEFVAR': 'defVar', 'CALL': 'call', 'RETURN': 'returnn',
+                    'PUSHS': 'pushs', 'POPS': 'pops', 'ADD': 'add', 'SUB': 'sub', 'MUL': 'mul',
+                    'IDIV': 'idiv', 'LT': 'lt', 'GT': 'gt', 'EQ': 'eq', 'AND': 'andd', 'OR': 'orr',
+                    'NOT': 'nott', 'INT2CHAR': 'int2char', 'STRI2INT': 'stri2int', 'READ': 'read',
+                    'WRITE': 'write', 'CONCAT': 'concat', 'STRLEN': 'strlen', 'GETCHAR': 'getchar',
+                    'SETCHAR': 'setchar', 'TYPE': 'typee', 'LABEL': 'label', 'JUMP': 'jump',
+                    'JUMPIFEQ': 'jumpifeq', 'JUMPIFNEQ': 'jumpifneq', 'EXIT': 'eexit',
+                    'DPRINT': 'dprint', 'BREAK': 'breakk',
+                    'CLEARS': 'clears', 'ADDS': 'adds', 'SUBS': 'subs', 'MULS': 'muls',
+                    'IDIVS': 'idivs', 'LTS': 'lts', 'GTS': 'gts', 'EQS': 'eqs', 'ANDS': 'ands',
+                    'ORS': 'ors', 'NOTS': 'nots', 'INT2CHARS': 'int2chars', 'STRI2INTS': 'stri2ints',
+                    'JUMPIFEQS': 'jumpifeqs', 'JUMPIFNEQS': 'jumpifneqs'}
+    def __init__(self, program, inputFile, outputFile = None, memoizer = None, errorFile = None, trace = None, idioms = None):
         self.program = program
         self.pc = 1
         self.memory = Memory()
         self.inputFile = inputFile
-        self.labels = dict()
-        for i in range(len(program.ins)):
-            if program.ins[i].opcode == "LABEL":
-                if len(program.ins[i].arg) != 1:
-                    stderr.write("spatny pocet arg11 {}".format(program.ins[i].arg))
-                    exit(32)
-                if program.ins[i].arg[0].type != "label":
-                    stderr.write("spatny typ arg")
-                    exit(53)
-                if program.ins[i].arg[0].name in self.labels:
-                    stderr.write("stejne pojmenovani navesti")
-                    exit(52)
-                self.labels[program.ins[i].arg[0].name] = i+1
+        self.outputFile = outputFile if outputFile is not None else stdout
+        self.labels = program.link()
+        self.memoizer = memoizer
+        #rozpracovaná memoizovaná volání: (hloubka zásobníku volání, klíč, rámec LF při volání)
+        self.memoPending = []
+        self.handlers = {opcode: getattr(self, name) for opcode, name in self.handlerNames.items()}
+        self.idioms = idioms
+        if idioms:
+            self.handlers["LABEL"] = self.labelIdiom
+        #počet provedených instrukcí a řádků přečtených ze vstupu
+        self.executed = 0
+        self.linesRead = 0
+        #periodické kontroly (např. ukládání snapshotů), každá vrací počet instrukcí do svého dalšího volání
+        #instrukce se počítají jen tehdy, když je nějaká kontrola zapnutá
+        self.periodic = []
+        self.nextCheck = 0
+        self.debugOutput = BufferedSink(errorFile)
+        #stopa běhu: posledních N dvojic (order, opcode), None když je vypnutá
+        self.trace = None
+        if trace is not None:
+            from collections import deque
+            self.trace = deque(maxlen = trace)
+    #vrací návratový kód programu (0 nebo hodnotu instrukce EXIT), chyby se šíří jako IPPError
+    #smyčka se volí předem: bez kontrol, stopy a BREAK se instrukce ani nepočítají
     def run(self):
-        while(True):
-            if self.pc == len(self.program.ins) + 1:
-                break
-            self.runInstruction()
+        try:
+            try:
+                if self.trace is not None:
+                    self.runTraced()
+                elif self.periodic or "BREAK" in self.program.opcodesUsed:
+                    self.runCounted()
+                else:
+                    ins = self.program.ins
+                    end = len(ins) + 1
+                    handlers = self.handlers
+                    while self.pc != end:
+                        instruction = ins[self.pc - 1]
+                        handlers[instruction.opcode](instruction)
+            except ProgramExit as e:
+                if e.code != 0:
+                    self.dumpTrace()
+                return e.code
+            except Exception:
+                #stopa se vypíše i při pádu mimo IPPError (např. ValueError), proces pak také končí nenulovým kódem
+                self.dumpTrace()
+                raise
+            return 0
+        finally:
+            self.debugOutput.flush()
+    #smyčka, která počítá provedené instrukce a spouští periodické kontroly
+    #instrukce se připočítávají po celých základních blocích (uvnitř bloku pc jen roste o 1),
+    #blok, který by přesáhl příští kontrolu, se provede po jedné instrukci, takže kontroly nastanou přesně
+    #(když blok skončí chybou, jeho instrukce se nezapočítají, počítadlo ale po chybě už nikdo nečte)
+    def runCounted(self):
+        ins = self.program.ins
+        end = len(ins) + 1
+        handlers = self.handlers
+        stops = self.program.blocks()
+        self.runPeriodic()
+        while self.pc != end:
+            start = self.pc
+            count = stops[start] - start + 1
+            if self.executed + count > self.nextCheck:
+                instruction = ins[start - 1]
+                handlers[instruction.opcode](instruction)
+                self.executed += 1
+            else:
+                for index in range(start - 1, start - 1 + count):
+                    instruction = ins[index]
+                    handlers[instruction.opcode](instruction)
+                self.executed += count
+            if self.executed >= self.nextCheck:
+                self.runPeriodic()
+    #jako runCounted, navíc zaznamenává každou instrukci do stopy
+    def runTraced(self):
+        ins = self.program.ins
+        end = len(ins) + 1
+        handlers = self.handlers
+        record = self.trace.append
+        self.runPeriodic()
+        while self.pc != end:
+            instruction = ins[self.pc - 1]
+            record((instruction.order, instruction.opcode))
+            handlers[instruction.opcode](instruction)
+            self.executed += 1
+            if self.executed >= self.nextCheck:
+                self.runPeriodic()
+    def runPeriodic(self):
+        if not self.periodic:
+            self.nextCheck = float("inf")
+            return
+        steps = min(check(self) for check in self.periodic)
+        self.nextCheck = self.executed + max(1, steps)
+    #vypíše stopu běhu (pokud je zapnutá), poslední záznam je instrukce, která skončila chybou nebo EXIT
+    def dumpTrace(self):
+        if not self.trace:
+            return
+        self.debugOutput.write("trace: last {} executed instructions\n".format(len(self.trace)))
+        for order, opcode in self.trace:
+            self.debugOutput.write("  {} {}\n".format(order, opcode))
+    #kompaktní výpis stavu výpočtu pro BREAK
+    def dumpState(self):
+        memory = self.memory
+        def frameText(frame):
+            return " ".join("{}={}".format(name, renderValue(value)) for name, value in frame.vars.items())
+        lines = ["BREAK pc {} executed {}".format(self.pc, self.executed),
+                 "GF: " + frameText(memory.globalFrame)]
+        if memory.temporaryFrame is None:
+            lines.append("TF: undefined")
+        else:
+            lines.append("TF: " + frameText(memory.temporaryFrame))
+        for depth, frame in enumerate(reversed(memory.localFrames)):
+            lines.append("LF[{}]: {}".format(depth, frameText(frame)))
+        lines.append("call stack: " + " ".join(str(pc) for pc in memory.callStack))
+        lines.append("data stack: " + " ".join(renderValue(value) for value in memory.dataStack))
+        self.debugOutput.write("\n".join(lines) + "\n")
     #funkce, která posílá na jednotlivé funkce programu
     def runInstruction(self):
         ins = self.program.ins[self.pc - 1]
-        if ins.opcode == "MOVE":
-            self.move(ins)
-        if ins.opcode == "CREATEFRAME":
-            self.createFrame(ins)
-        if ins.opcode == "PUSHFRAME":
-            self.pushFrame(ins)
-        if ins.opcode == "POPFRAME":
-            self.popFrame(ins)
-        if ins.opcode == "DEFVAR":
-            self.defVar(ins)
-        if ins.opcode == "CALL":
-            self.call(ins)
-        if ins.opcode == "RETURN":
-            self.returnn(ins)
-        if ins.opcode == "PUSHS":
-            self.pushs(ins)
-        if ins.opcode == "POPS":
-            self.pops(ins)
-        if ins.opcode == "ADD":
-            self.add(ins)
-        if ins.opcode == "SUB":
-            self.sub(ins)
-        if ins.opcode == "MUL":
-            self.mul(ins)
-        if ins.opcode == "IDIV":
-            self.idiv(ins)
-        if ins.opcode == "LT":
-            self.lt(ins)
-        if ins.opcode == "GT":
-            self.gt(ins)
-        if ins.opcode == "EQ":
-            self.eq(ins)
-        if ins.opcode == "AND":
-            self.andd(ins)
-        if ins.opcode == "OR":
-            self.orr(ins)
-        if ins.opcode == "NOT":
-            self.nott(ins)
-        if ins.opcode == "INT2CHAR":
-            self.int2char(ins)
-        if ins.opcode == "STRI2INT":
-            self.stri2int(ins)
-        if ins.opcode == "READ":
-            self.read(ins)
-        if ins.opcode == "WRITE":
-            self.write(ins)
-        if ins.opcode == "CONCAT":
-            self.concat(ins)
-        if ins.opcode == "STRLEN":
-            self.strlen(ins)
-        if ins.opcode == "GETCHAR":
-            self.getchar(ins)
-        if ins.opcode == "SETCHAR":
-            self.setchar(ins)
-        if ins.opcode == "TYPE":
-            self.typee(ins)
-        if ins.opcode == "LABEL":
-            self.label(ins)
-        if ins.opcode == "JUMP":
-            self.jump(ins)
-        if ins.opcode == "JUMPIFEQ":
-            self.jumpifeq(ins)
-        if ins.opcode == "JUMPIFNEQ":
-            self.jumpifneq(ins)
-        if ins.opcode == "EXIT":
-            self.eexit(ins)
-        if ins.opcode == "DPRINT":
-            self.dprint(ins)
-        if ins.opcode == "BREAK":
-            self.breakk(ins)
+        self.handlers[ins.opcode](ins)
 
 #definice funkci
     def move(self, ins):
         if len(ins.arg) != 2:
-            stderr.write("spatny pocet arg11 {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg11 {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[1].type != "var":
             if ins.arg[1].type == "int":
                 symVal = int(ins.arg[1].name)
@@ -307,54 +476,57 @@ class Interpret:
         self.pc+=1
     def createFrame(self, ins):
         if len(ins.arg) != 0:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         self.memory.temporaryFrame = Frame()
         self.pc+=1
     def pushFrame(self, ins):
         if self.memory.temporaryFrame == None:
-            stderr.write("nemam TF")
-            exit(55)
+            raise FrameError("nemam TF")
         self.memory.localFrames.append(self.memory.temporaryFrame)
         self.memory.temporaryFrame = None
         self.pc+=1
     def popFrame(self, ins):
         if self.memory.localFrames == []:
-            stderr.write("nemam LF")
-            exit(55)
+            raise FrameError("nemam LF")
         self.memory.temporaryFrame = self.memory.localFrames[-1]
         self.memory.localFrames.pop()
         self.pc+=1
     def defVar(self, ins):
         if len(ins.arg) != 1:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         self.memory.defVar(ins.arg[0].name)
         self.pc+=1
     def call(self, ins):
         if len(ins.arg) != 1:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "label":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
+        if self.memoizer is not None and ins.arg[0].name in self.memoizer.pure:
+            key = self.memoizer.key(ins.arg[0].name, self.memory)
+            result = self.memoizer.lookup(key)
+            if result is not None:
+                self.memoizer.replay(result, self.memory)
+                self.pc+=1
+                return
+            localFrame = self.memory.localFrames[-1] if self.memory.localFrames else None
+            self.memoPending.append((len(self.memory.callStack) + 1, key, localFrame))
         self.memory.callStack.append(self.pc+1)
         if ins.arg[0].name not in self.labels:
-            stderr.write("neznamy label")
-            exit(52)
+            raise SemanticError("neznamy label")
         self.pc = self.labels[ins.arg[0].name]
     def returnn(self, ins):
         if self.memory.callStack == []:
-            stderr.write("prazdny list")
-            exit(56)
+            raise MissingValueError("prazdny list")
+        if self.memoPending and self.memoPending[-1][0] == len(self.memory.callStack):
+            depth, key, localFrame = self.memoPending.pop()
+            if localFrame is (self.memory.localFrames[-1] if self.memory.localFrames else None):
+                self.memoizer.store(key, self.memory)
         self.pc = self.memory.callStack.pop()
     def pushs(self, ins):
         if len(ins.arg) != 1:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type == "var":
             var1 = self.memory.get(ins.arg[0].name)
         else:
@@ -363,14 +535,11 @@ class Interpret:
         self.pc+=1
     def pops(self, ins):
         if len(ins.arg) != 1:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if self.memory.dataStack == []:
-            stderr.write("prazdny zasobnik")
-            exit(56)
+            raise MissingValueError("prazdny zasobnik")
         value = self.memory.dataStack.pop()
         self.memory.set(ins.arg[0].name, value)
         self.pc+=1
@@ -379,11 +548,9 @@ class Interpret:
     
     def add(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -392,19 +559,13 @@ class Interpret:
             var2 = self.memory.get(ins.arg[2].name)
         else:
             var2 = getValue(ins.arg[2])
-        if type(var1) != int or type(var2) != int:
-            stderr.write("spatny typ")
-            exit(53)
-        result = var1 + var2
-        self.memory.set(ins.arg[0].name, result)
+        self.memory.set(ins.arg[0].name, addValues(var1, var2))
         self.pc += 1
     def sub(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -413,19 +574,13 @@ class Interpret:
             var2 = self.memory.get(ins.arg[2].name)
         else:
             var2 = getValue(ins.arg[2])
-        if type(var1) != int or type(var2) != int:
-            stderr.write("spatny typ")
-            exit(53)
-        result = var1 - var2
-        self.memory.set(ins.arg[0].name, result)
+        self.memory.set(ins.arg[0].name, subValues(var1, var2))
         self.pc += 1
     def mul(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -434,19 +589,13 @@ class Interpret:
             var2 = self.memory.get(ins.arg[2].name)
         else:
             var2 = getValue(ins.arg[2])
-        if type(var1) != int or type(var2) != int:
-            stderr.write("spatny typ")
-            exit(53)
-        result = var1 * var2
-        self.memory.set(ins.arg[0].name, result)
+        self.memory.set(ins.arg[0].name, mulValues(var1, var2))
         self.pc += 1
     def idiv(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -455,22 +604,13 @@ class Interpret:
             var2 = self.memory.get(ins.arg[2].name)
         else:
             var2 = getValue(ins.arg[2])
-        if type(var1) != int or type(var2) != int:
-            stderr.write("spatny typ")
-            exit(53)
-        if var2 == 0:
-            stderr.write("deleni nulou")
-            exit(57)
-        result = int(var1 / var2)
-        self.memory.set(ins.arg[0].name, result)
+        self.memory.set(ins.arg[0].name, idivValues(var1, var2))
         self.pc += 1
     def lt(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -479,32 +619,13 @@ class Interpret:
             var2 = self.memory.get(ins.arg[2].name)
         else:
             var2 = getValue(ins.arg[2])
-        if type(var1) == str and type(var2) == str:
-            if var1 < var2:
-                self.memory.set(ins.arg[0].name, True)
-            else:
-                self.memory.set(ins.arg[0].name, False)
-        elif type(var1) == int and type(var2) == int:
-            if var1 < var2:
-                self.memory.set(ins.arg[0].name, True)
-            else:
-                self.memory.set(ins.arg[0].name, False)
-        elif type(var1) == bool and type(var2) == bool:
-            if var1 == False and var2 == True:
-                self.memory.set(ins.arg[0].name, True)
-            else:
-                self.memory.set(ins.arg[0].name, False)
-        else:
-            stderr.write("spatne operandy")
-            exit(53)
+        self.memory.set(ins.arg[0].name, ltValues(var1, var2))
         self.pc+=1
     def gt(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -513,32 +634,13 @@ class Interpret:
             var2 = self.memory.get(ins.arg[2].name)
         else:
             var2 = getValue(ins.arg[2])
-        if type(var1) == str and type(var2) == str:
-            if var1 > var2:
-                self.memory.set(ins.arg[0].name, True)
-            else:
-                self.memory.set(ins.arg[0].name, False)
-        elif type(var1) == int and type(var2) == int:
-            if var1 > var2:
-                self.memory.set(ins.arg[0].name, True)
-            else:
-                self.memory.set(ins.arg[0].name, False)
-        elif type(var1) == bool and type(var2) == bool:
-            if var1 == True and var2 == False:
-                self.memory.set(ins.arg[0].name, True)
-            else:
-                self.memory.set(ins.arg[0].name, False)
-        else:
-            stderr.write("spatne operandy")
-            exit(53)
+        self.memory.set(ins.arg[0].name, gtValues(var1, var2))
         self.pc+=1
     def eq(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -547,37 +649,13 @@ class Interpret:
             var2 = self.memory.get(ins.arg[2].name)
         else:
             var2 = getValue(ins.arg[2])
-        if type(var1) == str and type(var2) == str:
-            if var1 == var2:
-                self.memory.set(ins.arg[0].name, True)
-            else:
-                self.memory.set(ins.arg[0].name, False)
-        elif type(var1) == int and type(var2) == int:
-            if var1 == var2:
-                self.memory.set(ins.arg[0].name, True)
-            else:
-                self.memory.set(ins.arg[0].name, False)
-        elif type(var1) == bool and type(var2) == bool:
-            if var1 == False and var2 == False or var1 == True and var2 == True:
-                self.memory.set(ins.arg[0].name, True)
-            else:
-                self.memory.set(ins.arg[0].name, False)
-        elif var1 == None or var2 == None:
-            if var1 == var2:
-                self.memory.set(ins.arg[0].name, True)
-            else:
-                self.memory.set(ins.arg[0].name, False)
-        else:
-            stderr.write("spatne operandy")
-            exit(53)
+        self.memory.set(ins.arg[0].name, eqValues(var1, var2))
         self.pc+=1
     def andd(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny operand")
-            exit(53)
+            raise OperandTypeError("spatny operand")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -586,18 +664,13 @@ class Interpret:
             var2 = self.memory.get(ins.arg[2].name)
         else:
             var2 = getValue(ins.arg[2])
-        if type(var1) != bool or type(var2) != bool:
-            stderr.write("spatny typ")
-            exit(53)
-        self.memory.set(ins.arg[0].name, var1 and var2)
+        self.memory.set(ins.arg[0].name, andValues(var1, var2))
         self.pc+=1
     def orr(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny operand")
-            exit(53)
+            raise OperandTypeError("spatny operand")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -606,55 +679,35 @@ class Interpret:
             var2 = self.memory.get(ins.arg[2].name)
         else:
             var2 = getValue(ins.arg[2])
-        if type(var1) != bool or type(var2) != bool:
-            stderr.write("spatny typ")
-            exit(53)
-        self.memory.set(ins.arg[0].name, var1 or var2)
+        self.memory.set(ins.arg[0].name, orValues(var1, var2))
         self.pc+=1
     def nott(self, ins):
         if len(ins.arg) != 2:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny operand")
-            exit(53)
+            raise OperandTypeError("spatny operand")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
             var1 = getValue(ins.arg[1])
-        if type(var1) != bool:
-            stderr.write("spatny typ")
-            exit(53)
-        self.memory.set(ins.arg[0].name, not var1)
+        self.memory.set(ins.arg[0].name, notValue(var1))
         self.pc+=1
     def int2char(self, ins):
         if len(ins.arg) != 2:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny operand")
-            exit(53)
+            raise OperandTypeError("spatny operand")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
             var1 = getValue(ins.arg[1])
-        if type(var1) != int:
-            stderr.write("spatny typ")
-            exit(53)
-        try:
-            char = chr(int(var1))
-            self.memory.set(ins.arg[0].name, char)
-            self.pc+=1
-        except Exception as e:
-            stderr.write("spatna ordinalni hodnota")
-            exit(58)
+        self.memory.set(ins.arg[0].name, int2charValue(var1))
+        self.pc+=1
     def stri2int(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny operand")
-            exit(53)
+            raise OperandTypeError("spatny operand")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -663,56 +716,27 @@ class Interpret:
             var2 = self.memory.get(ins.arg[2].name)
         else:
             var2 = getValue(ins.arg[2])
-        if type(var2) != int:
-            stderr.write("spatny typ")
-            exit(53)
-        if type(var1) != str:
-            stderr.write("spatny typ")
-            exit(53)
-        index = var2
-        if index >= 0 and index <= len(var1):
-            var2 = ord(var1[index])
-            self.memory.set(ins.arg[0].name, var2)
-            self.pc+=1
-        else:
-            stderr.write("spatna delka")
-            exit(58)
+        self.memory.set(ins.arg[0].name, stri2intValue(var1, var2))
+        self.pc+=1
         
     def read(self, ins):
         if len(ins.arg) != 2:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var" or ins.arg[1].type != "type":
-            stderr.write("spatne operandy {}, {}".format(ins.arg[0].type, ins.arg[1].type))
-            exit(32)
-        rawValue = self.inputFile.readline().rstrip('\n')
-        try:
-            if rawValue == "":
-                value = None
-            elif ins.arg[1].name == "int":
-                value = int(rawValue)
-            elif ins.arg[1].name == "bool":
-                if rawValue.lower() == 'true':
-                    value = True
-                else:
-                    value = False
-            elif ins.arg[1].name == "string":
-                value = rawValue
-            elif ins.arg[1].name == "nil":
-                value = None
-            else:
-                stderr.write("unknow type {}".format(value))
-                exit(52)
-        except Exception as e:
-            value = None
+            raise StructureError("spatne operandy {}, {}".format(ins.arg[0].type, ins.arg[1].type))
+        value = readValue(self.inputFile.readline(), ins.arg[1].name)
+        self.linesRead += 1
         self.memory.set(ins.arg[0].name, value)
         self.pc+=1
     def write(self, ins):
         if len(ins.arg) != 1:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
-        if ins.arg[0].type == "var":
-            value = self.memory.get(ins.arg[0].name)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
+        self.outputFile.write(self.symbolText(ins.arg[0]))
+        self.pc+=1
+    #text, který WRITE a DPRINT vypíší pro daný symbol
+    def symbolText(self, arg):
+        if arg.type == "var":
+            value = self.memory.get(arg.name)
             if value == None:
                 value = ""
             elif type(value) == bool:
@@ -720,83 +744,66 @@ class Interpret:
                     value = "true"
                 else:
                     value = "false"
-        elif ins.arg[0].type == "bool":
-            if ins.arg[0].name == "true":
+        elif arg.type == "bool":
+            if arg.name == "true":
                 value = "true"
             else:
                 value = "false"
-        elif ins.arg[0].type == "int":
-            value = ins.arg[0].name
-        elif ins.arg[0].type == "string":
-            value = ins.arg[0].name
-        elif ins.arg[0].type == "nil":
+        elif arg.type == "int":
+            value = arg.name
+        elif arg.type == "string":
+            value = arg.name
+        elif arg.type == "nil":
             value = ""
         else:
-            stderr.write("spatny typ operandu")
-            exit(53)
-        def replace(match):
-            return int(match.group(1)).to_bytes(1, byteorder="big")
+            raise OperandTypeError("spatny typ operandu")
         if type(value) == str:
-            value = bytes(value, "UTF-8")
-            regex = re.compile(rb"\\(\d{1,3})")
-            value = regex.sub(replace, value).decode()
-        print(value , end = "")
-        self.pc+=1
+            value = decodeEscapes(value)
+        return str(value)
     def concat(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
             if type(var1) != str:
-                stderr.write("neni string")
-                exit(53)
+                raise OperandTypeError("neni string")
         elif ins.arg[1].type == "string":
             var1 = ins.arg[1].name
         else:
-            stderr.write("spatny argument")
-            exit(53)
+            raise OperandTypeError("spatny argument")
         if ins.arg[2].type == "var":
             var2 = self.memory.get(ins.arg[2].name)
 
             if type(var2) != str:
-                stderr.write("neni string")
-                exit(53)
+                raise OperandTypeError("neni string")
         elif ins.arg[2].type == "string":
             var2 = ins.arg[2].name
         else:
-            stderr.write("spatny argument")
-            exit(53)
+            raise OperandTypeError("spatny argument")
         concat = (var1 + var2)
         self.memory.set(ins.arg[0].name, concat)
         self.pc+=1
     def strlen(self, ins):
         if len(ins.arg) != 2:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
             var1 = getValue(ins.arg[1])
         if type(var1) != str:
-            stderr.write("neni string")
-            exit(53)
+            raise OperandTypeError("neni string")
         varLen = len(var1)
         self.memory.set(ins.arg[0].name, varLen)
         self.pc+=1
     def getchar(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -806,22 +813,18 @@ class Interpret:
         else:
             var2 = getValue(ins.arg[2])
         if type(var1) != str or type(var2) != int:
-            stderr.write("spatne typy")
-            exit(53)
+            raise OperandTypeError("spatne typy")
         var1Len = len(var1)
         symbVal = var2
         if var1Len <= symbVal or symbVal < 0:
-            stderr.write("hodnota vetsi jak retezec")
-            exit(58)
+            raise StringError("hodnota vetsi jak retezec")
         self.memory.set(ins.arg[0].name, var1[var2])
         self.pc+=1
     def setchar(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -831,12 +834,10 @@ class Interpret:
         else:
             var2 = getValue(ins.arg[2])
         if type(var1) != int or type(var2) != str:
-            stderr.write("spatne typy")
-            exit(53)
+            raise OperandTypeError("spatne typy")
         var = self.memory.get(ins.arg[0].name)
         if len(var) <= var1 or var1 < 0 or len(var2) == 0:
-            stderr.write("hodnota vetsi jak retezec")
-            exit(58)
+            raise StringError("hodnota vetsi jak retezec")
         text = var
         new = list(text)
         new[var1] = var2[0]
@@ -845,11 +846,9 @@ class Interpret:
         self.pc+=1
     def typee(self, ins):
         if len(ins.arg) != 2:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "var":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -871,31 +870,29 @@ class Interpret:
             self.memory.set(ins.arg[0].name, typ)
             self.pc+=1
         else:
-            stderr.write("spatny operand")
-            exit(53)
+            raise OperandTypeError("spatny operand")
     def label(self, ins):
         self.pc+=1
+    #LABEL s rozpoznanými smyčkami: na hlavě smyčky zkusí provést celou smyčku najednou
+    def labelIdiom(self, ins):
+        idiom = self.idioms.get(self.pc)
+        if idiom is None or not idiom.run(self):
+            self.pc+=1
     def jump(self, ins):
         if len(ins.arg) != 1:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "label":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[0].name not in self.labels:
-            stderr.write("neznamy label")
-            exit(52)
+            raise SemanticError("neznamy label")
         self.pc = self.labels[ins.arg[0].name]
     def jumpifeq(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "label":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[0].name not in self.labels:
-            stderr.write("neznamy label")
-            exit(52)
+            raise SemanticError("neznamy label")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -904,23 +901,17 @@ class Interpret:
             var2 = self.memory.get(ins.arg[2].name)
         else:
             var2 = getValue(ins.arg[2])
-        if type(var1) != type(var2) and var1 != None and var2 != None:
-            stderr.write("spatne typy")
-            exit(53)
-        if var1 == var2:
+        if equalValues(var1, var2):
             self.pc = self.labels[ins.arg[0].name]
         else:
             self.pc+=1
     def jumpifneq(self, ins):
         if len(ins.arg) != 3:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type != "label":
-            stderr.write("spatny typ argumentu")
-            exit(53)
+            raise OperandTypeError("spatny typ argumentu")
         if ins.arg[0].name not in self.labels:
-            stderr.write("neznamy label")
-            exit(52)
+            raise SemanticError("neznamy label")
         if ins.arg[1].type == "var":
             var1 = self.memory.get(ins.arg[1].name)
         else:
@@ -929,34 +920,231 @@ class Interpret:
             var2 = self.memory.get(ins.arg[2].name)
         else:
             var2 = getValue(ins.arg[2])
-        if type(var1) != type(var2) and var1 != None and var2 != None:
-            stderr.write("spatne typy")
-            exit(53)
-        if var1 != var2:
+        if not equalValues(var1, var2):
             self.pc = self.labels[ins.arg[0].name]
         else:
             self.pc+=1
     def eexit(self, ins):
         if len(ins.arg) != 1:
-            stderr.write("spatny pocet arg {}".format(ins.arg))
-            exit(32)
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
         if ins.arg[0].type == "var":
             var = self.memory.get(ins.arg[0].name)
         else:
             var = getValue(ins.arg[0])
         if type(var) != int:
-            stderr.write("spatny typ")
-            exit(53)
+            raise OperandTypeError("spatny typ")
         if var >= 0 and var <= 49:
-            exit(var)
+            raise ProgramExit(var)
         else:
-            stderr.write("spatny int")
-            exit(57)
+            raise OperandValueError("spatny int")
         self.pc+=1
     def dprint(self, ins):
+        if len(ins.arg) != 1:
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
+        self.debugOutput.write(self.symbolText(ins.arg[0]))
         self.pc+=1
     def breakk(self, ins):
+        if len(ins.arg) != 0:
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
+        self.dumpState()
+        self.pc+=1
+
+    #zásobníkové varianty instrukcí, operandy berou z datového zásobníku a výsledek na něj ukládají
+    #druhý operand je na vrcholu zásobníku
+
+    #odebere ze zásobníku count operandů a vrátí je v pořadí, v jakém byly vloženy
+    def popOperands(self, ins, count):
+        if len(ins.arg) != 0:
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
+        stack = self.memory.dataStack
+        if len(stack) < count:
+            raise MissingValueError("prazdny zasobnik")
+        if count == 1:
+            return stack.pop()
+        var2 = stack.pop()
+        var1 = stack.pop()
+        return var1, var2
+    #provede binární operaci nad dvěma hodnotami z vrcholu zásobníku
+    def stackOp(self, ins, operation):
+        var1, var2 = self.popOperands(ins, 2)
+        self.memory.dataStack.append(operation(var1, var2))
+        self.pc+=1
+    def clears(self, ins):
+        if len(ins.arg) != 0:
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
+        self.memory.dataStack.clear()
         self.pc+=1
+    def adds(self, ins):
+        self.stackOp(ins, addValues)
+    def subs(self, ins):
+        self.stackOp(ins, subValues)
+    def muls(self, ins):
+        self.stackOp(ins, mulValues)
+    def idivs(self, ins):
+        self.stackOp(ins, idivValues)
+    def lts(self, ins):
+        self.stackOp(ins, ltValues)
+    def gts(self, ins):
+        self.stackOp(ins, gtValues)
+    def eqs(self, ins):
+        self.stackOp(ins, eqValues)
+    def ands(self, ins):
+        self.stackOp(ins, andValues)
+    def ors(self, ins):
+        self.stackOp(ins, orValues)
+    def nots(self, ins):
+        var1 = self.popOperands(ins, 1)
+        self.memory.dataStack.append(notValue(var1))
+        self.pc+=1
+    def int2chars(self, ins):
+        var1 = self.popOperands(ins, 1)
+        self.memory.dataStack.append(int2charValue(var1))
+        self.pc+=1
+    def stri2ints(self, ins):
+        self.stackOp(ins, stri2intValue)
+    #skok podle dvou hodnot z vrcholu zásobníku, jediným argumentem je návěští
+    def stackJump(self, ins, equal):
+        if len(ins.arg) != 1:
+            raise StructureError("spatny pocet arg {}".format(ins.arg))
+        if ins.arg[0].type != "label":
+            raise OperandTypeError("spatny typ argumentu")
+        if ins.arg[0].name not in self.labels:
+            raise SemanticError("neznamy label")
+        stack = self.memory.dataStack
+        if len(stack) < 2:
+            raise MissingValueError("prazdny zasobnik")
+        var2 = stack.pop()
+        var1 = stack.pop()
+        if equalValues(var1, var2) == equal:
+            self.pc = self.labels[ins.arg[0].name]
+        else:
+            self.pc+=1
+    def jumpifeqs(self, ins):
+        self.stackJump(ins, True)
+    def jumpifneqs(self, ins):
+        self.stackJump(ins, False)
+
+#převede řádek načtený instrukcí READ na hodnotu požadovaného typu, neplatný vstup je nil
+def readValue(line, typeName):
+    rawValue = line.rstrip('\n')
+    try:
+        if rawValue == "":
+            value = None
+        elif typeName == "int":
+            value = int(rawValue)
+        elif typeName == "bool":
+            if rawValue.lower() == 'true':
+                value = True
+            else:
+                value = False
+        elif typeName == "string":
+            value = rawValue
+        elif typeName == "nil":
+            value = None
+        else:
+            raise SemanticError("unknow type {}".format(value))
+    except Exception as e:
+        value = None
+    return value
+
+#operace nad hodnotami společné pro instrukce s operandy v proměnných i pro jejich zásobníkové varianty
+#ověří typy operandů a vrátí výsledek
+
+def addValues(var1, var2):
+    if type(var1) != int or type(var2) != int:
+        raise OperandTypeError("spatny typ")
+    return var1 + var2
+def subValues(var1, var2):
+    if type(var1) != int or type(var2) != int:
+        raise OperandTypeError("spatny typ")
+    return var1 - var2
+def mulValues(var1, var2):
+    if type(var1) != int or type(var2) != int:
+        raise OperandTypeError("spatny typ")
+    return var1 * var2
+def idivValues(var1, var2):
+    if type(var1) != int or type(var2) != int:
+        raise OperandTypeError("spatny typ")
+    if var2 == 0:
+        raise OperandValueError("deleni nulou")
+    return int(var1 / var2)
+def ltValues(var1, var2):
+    if type(var1) == str and type(var2) == str:
+        return var1 < var2
+    elif type(var1) == int and type(var2) == int:
+        return var1 < var2
+    elif type(var1) == bool and type(var2) == bool:
+        return var1 == False and var2 == True
+    else:
+        raise OperandTypeError("spatne operandy")
+def gtValues(var1, var2):
+    if type(var1) == str and type(var2) == str:
+        return var1 > var2
+    elif type(var1) == int and type(var2) == int:
+        return var1 > var2
+    elif type(var1) == bool and type(var2) == bool:
+        return var1 == True and var2 == False
+    else:
+        raise OperandTypeError("spatne operandy")
+def eqValues(var1, var2):
+    if type(var1) == str and type(var2) == str:
+        return var1 == var2
+    elif type(var1) == int and type(var2) == int:
+        return var1 == var2
+    elif type(var1) == bool and type(var2) == bool:
+        return var1 == var2
+    elif var1 == None or var2 == None:
+        return var1 == var2
+    else:
+        raise OperandTypeError("spatne operandy")
+def andValues(var1, var2):
+    if type(var1) != bool or type(var2) != bool:
+        raise OperandTypeError("spatny typ")
+    return var1 and var2
+def orValues(var1, var2):
+    if type(var1) != bool or type(var2) != bool:
+        raise OperandTypeError("spatny typ")
+    return var1 or var2
+def notValue(var1):
+    if type(var1) != bool:
+        raise OperandTypeError("spatny typ")
+    return not var1
+def int2charValue(var1):
+    if type(var1) != int:
+        raise OperandTypeError("spatny typ")
+    try:
+        return chr(int(var1))
+    except Exception as e:
+        raise StringError("spatna ordinalni hodnota")
+def stri2intValue(var1, var2):
+    if type(var2) != int:
+        raise OperandTypeError("spatny typ")
+    if type(var1) != str:
+        raise OperandTypeError("spatny typ")
+    index = var2
+    if index >= 0 and index < len(var1):
+        return ord(var1[index])
+    else:
+        raise StringError("spatna delka")
+#porovnání pro podmíněné skoky, nil lze porovnat s čímkoliv
+def equalValues(var1, var2):
+    if type(var1) != type(var2) and var1 != None and var2 != None:
+        raise OperandTypeError("spatne typy")
+    return var1 == var2
+
+#pomocná funkce převádí escape sekvence \ddd v řetězci na znaky
+#regulární výraz se zkompiluje až při prvním řetězci, který nějakou escape sekvenci obsahuje
+escapeRegex = None
+def replaceEscape(match):
+    return int(match.group(1)).to_bytes(1, byteorder="big")
+def decodeEscapes(value):
+    global escapeRegex
+    if "\\" not in value:
+        return value
+    if escapeRegex is None:
+        import re
+        escapeRegex = re.compile(rb"\\(\d{1,3})")
+    return escapeRegex.sub(replaceEscape, bytes(value, "UTF-8")).decode()
 
 #pomocná funkce vrací hodnotu argumentu konstantního symbolu
 def getValue(arg):
@@ -972,52 +1160,240 @@ def getValue(arg):
     elif arg.type == "nil":
         symVal = None
     else:
-        stderr.write("spatny typ")
-        exit(53)
+        raise OperandTypeError("spatny typ")
     return symVal
 
 
-sourceFile = ""
-inputFile = ""
+#načte XML reprezentaci programu ze souboru (nebo ze stdin, pokud soubor není zadán)
+def loadProgram(source = None):
+    import xml.etree.ElementTree as ET
+    try:
+        if source:
+            with open(source, "r") as fp:
+                tree = ET.parse(fp)
+        else:
+            tree = ET.parse(stdin)
+        return Program(tree.getroot())
+    except IPPError:
+        raise
+    except Exception as e:
+        raise SourceError(str(e)+"\n"+"missing source file")
 
-parser = argparse.ArgumentParser(add_help = False)
-parser.add_argument("--help", action = "store_true")
-parser.add_argument("--source")
-parser.add_argument("--input")
-args = parser.parse_args()
+#načte program z XML řetězce
+def parseProgram(text):
+    import xml.etree.ElementTree as ET
+    try:
+        return Program(ET.fromstring(text))
+    except IPPError:
+        raise
+    except Exception as e:
+        raise SourceError(str(e)+"\n"+"wrong source code")
 
-if args.help:
-    print("--help:")
-    print("--source=file pro vstupní soubor s XML reprezentací zdrojového kódu")
-    print("--input=file soubor se vstupy pro samotnou interpretaci zadaného zdrojového kódu")
-    if args.source or args.input:
-        exit(10)
-    else:
-        exit(0)
-try:
-    if args.source:
-        with open(args.source, "r") as fp:
-            tree = ET.parse(fp)
-    else:
-        tree = ET.parse(stdin)
-    vals = []
-    root = tree.getroot()
-    program = Program(tree.getroot())
-except Exception as e:
-    stderr.write(str(e)+"\n")
-    stderr.write("missing source file")
-    exit(31)
-try:
-    if args.input:
-        inputFile = open(args.input, "r")
-    else:
-        inputFile = stdin
-except Exception as e:
-    stderr.write("missing input file")
-    exit(31)
-interpreter = Interpret(program, inputFile)
-interpreter.run()
+#otevře vstupní soubor interpretovaného programu (nebo stdin, pokud soubor není zadán)
+def openInput(path = None):
+    if not path:
+        return stdin
+    try:
+        return open(path, "r")
+    except Exception as e:
+        raise SourceError("missing input file")
+
+#spustí program a vrátí jeho návratový kód, chybu vypíše na stderr stejně jako CLI
+#limits jsou parametry třídy Budget (instrukce, sekundy, zásobník, bajty), None znamená bez omezení
+#další pojmenované parametry se předají konstruktoru třídy Interpret
+def runProgram(program, inputFile, outputFile = None, limits = None, **options):
+    try:
+        interpreter = Interpret(program, inputFile, outputFile, **options)
+        if limits is not None:
+            from budget import Budget
+            interpreter.periodic.append(Budget(*limits).check)
+        return interpreter.run()
+    except IPPError as e:
+        stderr.write(str(e))
+        return e.code
+
+#volby příkazové řádky: (název, typ hodnoty, výchozí hodnota), typ None značí přepínač
+cliOptions = [
+    ("--help", None, False),
+    ("--source", str, None),
+    ("--input", str, None),
+    ("--batch", str, None),
+    ("--results", str, None),
+    ("--jobs", int, os.cpu_count() or 1),
+    ("--server", str, None),
+    ("--cache-size", int, 64),
+    ("--memoize", int, None),
+    ("--lockstep", None, False),
+    ("--image", None, False),
+    ("--idioms", None, False),
+    ("--sessions", str, None),
+    ("--yield-every", int, 1000),
+    ("--checkpoint", str, None),
+    ("--checkpoint-every", int, None),
+    ("--checkpoint-seconds", int, None),
+    ("--resume", str, None),
+    ("--max-instructions", int, None),
+    ("--max-seconds", int, None),
+    ("--max-stack", int, None),
+    ("--max-bytes", int, None),
+    ("--trace", int, None),
+    ("--threaded-io", None, False),
+]
 
+#zpracování voleb přes argparse, použije se jen pro neobvyklé tvary (zkratky voleb, chyby)
+def parseArgsSlow(argv):
+    import argparse
+    parser = argparse.ArgumentParser(add_help = False)
+    for name, kind, default in cliOptions:
+        if kind is None:
+            parser.add_argument(name, action = "store_true")
+        else:
+            parser.add_argument(name, type = kind, default = default)
+    return parser.parse_args(argv)
+
+#rychlá cesta pro obvyklé volby ve tvaru --volba=hodnota, ušetří import argparse při každém startu
+def parseArgs(argv):
+    from types import SimpleNamespace
+    kinds = dict()
+    values = dict()
+    for name, kind, default in cliOptions:
+        kinds[name] = kind
+        values[name[2:].replace("-", "_")] = default
+    for arg in argv:
+        name, sep, value = arg.partition("=")
+        if name not in kinds or (kinds[name] is None) == bool(sep):
+            return parseArgsSlow(argv)
+        if kinds[name] is None:
+            value = True
+        elif kinds[name] is int:
+            if not value.isdigit():
+                return parseArgsSlow(argv)
+            value = int(value)
+        values[name[2:].replace("-", "_")] = value
+    return SimpleNamespace(**values)
+
+#příkazová řádka, chyby převádí na návratové kódy procesu
+def main(argv = None):
+    if argv is None:
+        from sys import argv as sysArgv
+        argv = sysArgv[1:]
+    args = parseArgs(argv)
 
+    if args.help:
+        print("--help:")
+        print("--source=file pro vstupní soubor s XML reprezentací zdrojového kódu")
+        print("--input=file soubor se vstupy pro samotnou interpretaci zadaného zdrojového kódu")
+        print("--batch=file manifest úloh (JSON řádky se source a input) pro dávkové spouštění (každou úlohu omezují volby --max-*)")
+        print("--results=file soubor pro výsledky dávky (výchozí je stdout)")
+        print("--jobs=N počet pracovních procesů dávky (výchozí je počet jader)")
+        print("--server=socket spustí interpret jako server na unixovém socketu (každý požadavek omezují volby --max-*, bez nich 10 s)")
+        print("--cache-size=N počet programů, které si server pamatuje (výchozí 64)")
+        print("--memoize=N zapne memoizaci volání čistých podprogramů s cache o N záznamech (statistiku vypíše na stderr)")
+        print("--lockstep dávka spouští vstupy jednoho programu najednou vektorově (vyžaduje NumPy)")
+        print("--image dávka sdílí mezi workery obraz každého programu ve sdílené paměti místo vlastních kopií")
+        print("--idioms rozpozná jednoduché smyčky s čítačem (součet, přidávání a kopírování znaků, SETCHAR) a provede je najednou")
+        print("--sessions=socket program ze --source obsluhuje interaktivní sezení na unixovém socketu")
+        print("--yield-every=N po kolika instrukcích sezení předá řízení ostatním (výchozí 1000)")
+        print("--checkpoint=file průběžně ukládá stav výpočtu do souboru")
+        print("--checkpoint-every=N ukládá stav každých N instrukcí")
+        print("--checkpoint-seconds=T ukládá stav každých T sekund (výchozí 60, pokud není zadáno N)")
+        print("--resume=file obnoví stav výpočtu ze souboru a pokračuje")
+        print("--max-instructions=N ukončí program po N provedených instrukcích (návratový kód 59)")
+        print("--max-seconds=T ukončí program po T sekundách")
+        print("--max-stack=N omezí hloubku datového zásobníku a zásobníku volání")
+        print("--max-bytes=N omezí přibližnou velikost hodnot v rámcích a na zásobnících")
+        print("--trace=N při chybě nebo nenulovém EXIT vypíše na stderr posledních N provedených instrukcí")
+        print("--threaded-io vstup načítá dopředu a výstup zapisuje vlákny na pozadí (pro pomalé roury)")
+        if args.source or args.input or args.batch or args.server:
+            return 10
+        else:
+            return 0
+    try:
+        limits = (args.max_instructions, args.max_seconds, args.max_stack, args.max_bytes)
+        if not any(limit is not None for limit in limits):
+            limits = None
+        #volby jednoho běhu programu ze --source, které dávka, server ani sezení nepoužijí
+        #(nemají vlastní vstupní soubor ani soubor výstupu, který by šlo uložit nebo obnovit)
+        singleRun = args.input or args.threaded_io or args.checkpoint or args.resume or \
+                    args.memoize is not None or args.idioms
+        #volby dávky (--lockstep, --image, --results) bez --batch nemají na co působit
+        if not args.batch and (args.lockstep or args.image or args.results):
+            raise IPPError("wrong combination of parameters", 10)
+        if args.batch:
+            if args.source or singleRun or args.trace is not None or args.jobs < 1:
+                raise IPPError("wrong combination of parameters", 10)
+            from batch import runBatch
+            runBatch(args.batch, args.results, args.jobs, args.lockstep, args.image, limits)
+            return 0
+        if args.server:
+            if args.source or singleRun or args.trace is not None or args.cache_size < 1:
+                raise IPPError("wrong combination of parameters", 10)
+            from server import runServer
+            runServer(args.server, args.cache_size, limits)
+            return 0
+        program = loadProgram(args.source)
+        if args.sessions:
+            if singleRun or args.yield_every < 1 or (args.trace is not None and args.trace < 1):
+                raise IPPError("wrong combination of parameters", 10)
+            program.link()
+            from sessions import runSessions
+            runSessions(program, args.sessions, args.yield_every, limits, trace = args.trace)
+            return 0
+        inputFile = openInput(args.input)
+        options = dict()
+        output = None
+        if args.threaded_io:
+            from threadedio import PrefetchInput, BackgroundOutput
+            inputFile = PrefetchInput(inputFile)
+            output = options["outputFile"] = BackgroundOutput(stdout)
+        if args.memoize is not None:
+            if args.memoize < 1:
+                raise IPPError("wrong combination of parameters", 10)
+            from memoize import Memoizer
+            options["memoizer"] = Memoizer(program, args.memoize)
+        if args.idioms:
+            from idioms import findIdioms
+            options["idioms"] = findIdioms(program)
+        if args.trace is not None:
+            if args.trace < 1:
+                raise IPPError("wrong combination of parameters", 10)
+            options["trace"] = args.trace
+        interpreter = Interpret(program, inputFile, **options)
+        checkpointer = None
+        if args.checkpoint:
+            if args.checkpoint_every is None and args.checkpoint_seconds is None:
+                args.checkpoint_seconds = 60
+            if (args.checkpoint_every is not None and args.checkpoint_every < 1) or \
+               (args.checkpoint_seconds is not None and args.checkpoint_seconds < 1):
+                raise IPPError("wrong combination of parameters", 10)
+            from checkpoint import Checkpointer
+            checkpointer = Checkpointer(args.checkpoint, args.checkpoint_every, args.checkpoint_seconds)
+            interpreter.periodic.append(checkpointer.check)
+        if limits is not None:
+            from budget import Budget
+            interpreter.periodic.append(Budget(*limits).check)
+        try:
+            if args.resume:
+                from checkpoint import loadSnapshot, restore
+                restore(interpreter, loadSnapshot(args.resume))
+            code = interpreter.run()
+        finally:
+            #výstup z vlákna na pozadí musí být celý venku i při chybě, dřív než se vypíše hlášení
+            if output is not None:
+                output.close()
+            #statistika memoizace, aby bylo z příkazové řádky vidět, jestli se vyplatí
+            if "memoizer" in options:
+                stderr.write("memoize: {hits} hits, {misses} misses, {size} cached calls\n".format(**options["memoizer"].stats()))
+        if checkpointer is not None:
+            checkpointer.discard()
+        return code
+    except IPPError as e:
+        stderr.write(str(e))
+        return e.code
 
 
+if __name__ == "__main__":
+    #moduly jako lockstep importují interpret, musí dostat tento modul a ne jeho druhou kopii
+    import sys
+    sys.modules.setdefault("interpret", sys.modules[__name__])
+    exit(main())
@@ -0,0 +1,337 @@
+#lockstep interpretace jednoho programu nad N vstupy najednou (vyžaduje NumPy)
+#všechny běhy (lany) sdílí řízení toku, liší se jen data: celočíselné a booleovské hodnoty,
+#které se mezi lanami liší, jsou uložené jako NumPy pole (jeden prvek na lanu)
+#aritmetické, relační a booleovské instrukce se vyhodnocují vektorově
+#lana, která se od ostatních odliší (podmíněný skok jinam, dělení nulou, jiný typ načtené hodnoty)
+#nebo narazí na instrukci, kterou nelze provést vektorově (např. řetězcové operace nad polem),
+#se oddělí a dokončí ve skalárním interpretu (třída Interpret) ze stejného stavu
+#výstup a návratový kód každé lany jsou proto stejné jako při samostatném běhu
+
+import io
+from sys import stderr
+
+import numpy as np
+
+from interpret import (Interpret, Memory, Frame, IPPError, ProgramExit, getValue, readValue,
+                       addValues, subValues, mulValues, idivValues, ltValues, gtValues, eqValues,
+                       andValues, orValues, notValue, equalValues)
+
+#hodnoty v poli musí zůstat tak malé, aby výsledek operace nepřetekl int64
+#(u IDIV navíc přesně v rozsahu float64, protože skalární interpret dělí přes float)
+addLimit = 2 ** 62
+mulLimit = 2 ** 31
+idivLimit = 2 ** 53
+
+#instrukce, které pracují jen se strukturou paměti a nezávisí na hodnotách, provedou se skalárně pro všechny lany
+structural = ("MOVE", "CREATEFRAME", "PUSHFRAME", "POPFRAME", "DEFVAR", "CALL", "RETURN",
+              "PUSHS", "POPS", "CLEARS", "LABEL", "JUMP")
+#zásobníkové instrukce, jejichž operandy jsou na vrcholu datového zásobníku
+stackOpcodes = ("ADDS", "SUBS", "MULS", "IDIVS", "LTS", "GTS", "EQS", "ANDS", "ORS", "NOTS",
+                "INT2CHARS", "STRI2INTS", "JUMPIFEQS", "JUMPIFNEQS")
+
+def isLanes(value):
+    return isinstance(value, np.ndarray)
+
+#vrací typ hodnoty stejně jako instrukce TYPE
+def kindOf(value):
+    if isLanes(value):
+        return "bool" if value.dtype == np.bool_ else "int"
+    if value is None:
+        return "nil"
+    if type(value) == bool:
+        return "bool"
+    if type(value) == int:
+        return "int"
+    return "string"
+
+#hodnota jedné lany jako obyčejná hodnota skalárního interpretu
+def laneValue(value, lane):
+    if isLanes(value):
+        return value[lane].item()
+    return value
+
+#ověří, že jsou všechny hodnoty v absolutní hodnotě menší než limit
+def fits(value, limit):
+    if isLanes(value):
+        return value.size == 0 or int(np.abs(value).max()) < limit
+    return abs(value) < limit
+
+class LockstepInterpret(Interpret):
+    def __init__(self, program, inputFiles):
+        super().__init__(program, None, None)
+        self.inputFiles = inputFiles
+        self.outputs = [io.StringIO() for inputFile in inputFiles]
+        self.results = [None] * len(inputFiles)
+        #indexy lan, které ještě běží v lockstepu, pořadí odpovídá prvkům polí v paměti
+        self.active = np.arange(len(inputFiles))
+        vector = {"ADD": self.vadd, "SUB": self.vsub, "MUL": self.vmul, "IDIV": self.vidiv,
+                  "LT": self.vlt, "GT": self.vgt, "EQ": self.veq, "AND": self.vand, "OR": self.vor,
+                  "NOT": self.vnot, "JUMPIFEQ": self.vjumpifeq, "JUMPIFNEQ": self.vjumpifneq,
+                  "READ": self.vread, "WRITE": self.vwrite, "TYPE": self.vtype}
+        self.scalarHandlers = self.handlers
+        self.handlers = dict()
+        for opcode, handler in self.scalarHandlers.items():
+            if opcode in vector:
+                self.handlers[opcode] = vector[opcode]
+            elif opcode in structural:
+                self.handlers[opcode] = handler
+            else:
+                self.handlers[opcode] = self.generic
+
+    #vrací seznam dvojic (návratový kód, výstup) pro jednotlivé vstupy
+    def run(self):
+        end = len(self.program.ins) + 1
+        while self.active.size and self.pc != end:
+            ins = self.program.ins[self.pc - 1]
+            try:
+                self.handlers[ins.opcode](ins)
+            except ProgramExit as e:
+                self.finish(e.code)
+            except IPPError as e:
+                self.finish(e.code, str(e))
+        self.finish(0)
+        return self.results
+
+    #ukončí všechny lany se stejným výsledkem
+    def finish(self, code, message = None):
+        for lane in self.active.tolist():
+            if message is not None:
+                stderr.write(message)
+            self.results[lane] = (code, self.outputs[lane].getvalue())
+        self.active = self.active[:0]
+
+    #paměť jedné lany pro skalární interpret
+    def laneMemory(self, lane):
+        def copyFrame(frame):
+            if frame is None:
+                return None
+            copy = Frame()
+            copy.vars = {name: laneValue(value, lane) for name, value in frame.vars.items()}
+            return copy
+        memory = Memory()
+        memory.globalFrame = copyFrame(self.memory.globalFrame)
+        memory.temporaryFrame = copyFrame(self.memory.temporaryFrame)
+        memory.localFrames = [copyFrame(frame) for frame in self.memory.localFrames]
+        memory.callStack = list(self.memory.callStack)
+        memory.dataStack = [laneValue(value, lane) for value in self.memory.dataStack]
+        return memory
+
+    #oddělí lany označené maskou a dokončí je skalárně od instrukce pc
+    #patch(memory, lane) může před spuštěním upravit paměť lany (např. dokončit rozpracovaný READ)
+    def split(self, mask, pc = None, patch = None):
+        pc = self.pc if pc is None else pc
+        for lane in np.nonzero(mask)[0].tolist():
+            index = self.active[lane].item()
+            interpreter = Interpret(self.program, self.inputFiles[index], self.outputs[index])
+            interpreter.memory = self.laneMemory(lane)
+            interpreter.pc = pc
+            try:
+                if patch is not None:
+                    patch(interpreter.memory, lane)
+                code = interpreter.run()
+            except IPPError as e:
+                stderr.write(str(e))
+                code = e.code
+            self.results[index] = (code, self.outputs[index].getvalue())
+        keep = ~mask
+        self.active = self.active[keep]
+        def compact(frame):
+            if frame is not None:
+                frame.vars = {name: value[keep] if isLanes(value) else value for name, value in frame.vars.items()}
+        compact(self.memory.globalFrame)
+        compact(self.memory.temporaryFrame)
+        for frame in self.memory.localFrames:
+            compact(frame)
+        self.memory.dataStack = [value[keep] if isLanes(value) else value for value in self.memory.dataStack]
+
+    def splitAll(self):
+        self.split(np.ones(self.active.size, dtype = bool))
+
+    #instrukce bez vektorové varianty: pokud žádný operand není pole, provede se skalárně pro všechny lany
+    #(DPRINT a BREAK píšou na stderr za každý běh zvlášť, proto se vždy oddělí všechny lany)
+    def generic(self, ins):
+        if ins.opcode in ("DPRINT", "BREAK"):
+            return self.splitAll()
+        values = []
+        try:
+            for arg in ins.arg:
+                if arg.type == "var":
+                    values.append(self.memory.get(arg.name))
+        except IPPError:
+            values = []
+        if ins.opcode in stackOpcodes:
+            values.extend(self.memory.dataStack[-2:])
+        if any(isLanes(value) for value in values):
+            self.splitAll()
+        else:
+            self.scalarHandlers[ins.opcode](ins)
+
+    #vrací hodnoty operandů od argumentu start, pokud je instrukci možné provést vektorově, jinak None
+    #(chybné argumenty a čistě skalární operandy nechává na skalární implementaci)
+    #destination značí, že první argument je proměnná pro výsledek
+    def operands(self, ins, count, start = 1, destination = True):
+        if len(ins.arg) != count:
+            return None
+        if destination and ins.arg[0].type != "var":
+            return None
+        try:
+            if destination:
+                self.memory.get(ins.arg[0].name)
+            values = [self.memory.get(arg.name) if arg.type == "var" else getValue(arg) for arg in ins.arg[start:]]
+        except IPPError:
+            return None
+        if not any(isLanes(value) for value in values):
+            return None
+        return values
+
+    #společný průběh aritmetických, relačních a booleovských instrukcí
+    #chyby typů jsou pro všechny lany stejné, proto je vyvolá skalární operace nad hodnotami první lany
+    def binary(self, ins, operation, vector):
+        values = self.operands(ins, 3)
+        if values is None:
+            return self.scalarHandlers[ins.opcode](ins)
+        var1, var2 = values
+        operation(laneValue(var1, 0), laneValue(var2, 0))
+        result = vector(var1, var2)
+        if result is None:
+            return
+        self.memory.set(ins.arg[0].name, result)
+        self.pc += 1
+
+    def vadd(self, ins):
+        self.binary(ins, addValues, lambda a, b: self.checked(a, b, addLimit, np.add))
+    def vsub(self, ins):
+        self.binary(ins, subValues, lambda a, b: self.checked(a, b, addLimit, np.subtract))
+    def vmul(self, ins):
+        self.binary(ins, mulValues, lambda a, b: self.checked(a, b, mulLimit, np.multiply))
+    #celočíselná operace, která by mohla přetéct, se celá přenechá skalárnímu interpretu
+    def checked(self, var1, var2, limit, operation):
+        if not fits(var1, limit) or not fits(var2, limit):
+            self.splitAll()
+            return None
+        return operation(var1, var2, dtype = np.int64)
+    def vidiv(self, ins):
+        values = self.operands(ins, 3)
+        if values is None:
+            return self.scalarHandlers[ins.opcode](ins)
+        var1, var2 = values
+        if kindOf(var1) == "int" and kindOf(var2) == "int":
+            zero = np.broadcast_to(var2 == 0, self.active.shape)
+            if zero.any():
+                #lany s dělením nulou skončí chybou ve skalárním interpretu, ostatní instrukci zopakují
+                self.split(zero.copy())
+                return
+        self.binary(ins, idivValues, lambda a, b: self.divide(a, b))
+    def divide(self, var1, var2):
+        if not fits(var1, idivLimit) or not fits(var2, idivLimit):
+            self.splitAll()
+            return None
+        return np.trunc(np.true_divide(var1, var2)).astype(np.int64)
+    def vlt(self, ins):
+        self.binary(ins, ltValues, lambda a, b: np.less(a, b) if kindOf(a) == "int" else np.logical_and(np.logical_not(a), b))
+    def vgt(self, ins):
+        self.binary(ins, gtValues, lambda a, b: np.greater(a, b) if kindOf(a) == "int" else np.logical_and(a, np.logical_not(b)))
+    def veq(self, ins):
+        self.binary(ins, eqValues, self.equal)
+    #porovnání lan, nil se nerovná žádné hodnotě v poli
+    def equal(self, var1, var2):
+        if var1 is None or var2 is None:
+            return np.zeros(self.active.size, dtype = bool)
+        return np.broadcast_to(np.equal(var1, var2), self.active.shape).copy()
+    def vand(self, ins):
+        self.binary(ins, andValues, np.logical_and)
+    def vor(self, ins):
+        self.binary(ins, orValues, np.logical_or)
+    def vnot(self, ins):
+        values = self.operands(ins, 2)
+        if values is None:
+            return self.scalarHandlers[ins.opcode](ins)
+        notValue(laneValue(values[0], 0))
+        self.memory.set(ins.arg[0].name, np.logical_not(values[0]))
+        self.pc += 1
+    def vtype(self, ins):
+        values = self.operands(ins, 2)
+        if values is None:
+            return self.scalarHandlers[ins.opcode](ins)
+        self.memory.set(ins.arg[0].name, kindOf(values[0]))
+        self.pc += 1
+
+    #podmíněný skok: pokud se lany neshodnou, oddělí se menšina a skok se pro zbytek zopakuje
+    def vjump(self, ins, equal):
+        if len(ins.arg) != 3 or ins.arg[0].type != "label" or ins.arg[0].name not in self.labels:
+            return self.scalarHandlers[ins.opcode](ins)
+        values = self.operands(ins, 3, destination = False)
+        if values is None:
+            return self.scalarHandlers[ins.opcode](ins)
+        var1, var2 = values
+        equalValues(laneValue(var1, 0), laneValue(var2, 0))
+        taken = self.equal(var1, var2) == equal
+        count = int(taken.sum())
+        if count == 0 or count == taken.size:
+            if count:
+                self.pc = self.labels[ins.arg[0].name]
+            else:
+                self.pc += 1
+            return
+        self.split(taken if count * 2 < taken.size else ~taken)
+    def vjumpifeq(self, ins):
+        self.vjump(ins, True)
+    def vjumpifneq(self, ins):
+        self.vjump(ins, False)
+
+    #READ načte řádek pro každou lanu, lany s jiným typem hodnoty než většina se oddělí
+    def vread(self, ins):
+        if len(ins.arg) != 2 or ins.arg[0].type != "var" or ins.arg[1].type != "type":
+            return self.scalarHandlers[ins.opcode](ins)
+        try:
+            self.memory.get(ins.arg[0].name)
+        except IPPError:
+            #skalární READ nejdřív přečte řádek a chybu ohlásí až potom, to už musí udělat každá lana sama
+            return self.splitAll()
+        values = [readValue(self.inputFiles[index].readline(), ins.arg[1].name) for index in self.active.tolist()]
+        kinds = []
+        for value in values:
+            kind = kindOf(value)
+            if kind == "int" and not fits(value, addLimit):
+                kind = "big"
+            kinds.append(kind)
+        majority = max(set(kinds), key = kinds.count)
+        if majority not in ("int", "bool", "nil"):
+            majority = None
+        other = np.array([kind != majority for kind in kinds], dtype = bool)
+        if other.any():
+            def patch(memory, lane):
+                memory.set(ins.arg[0].name, values[lane])
+            self.split(other, self.pc + 1, patch)
+            values = [value for value, moved in zip(values, other.tolist()) if not moved]
+            if not values:
+                return
+        if majority == "nil":
+            self.memory.set(ins.arg[0].name, None)
+        else:
+            self.memory.set(ins.arg[0].name, np.array(values, dtype = np.int64 if majority == "int" else bool))
+        self.pc += 1
+
+    #WRITE zapíše do výstupu každé lany, skalární hodnota se naformátuje jen jednou
+    def vwrite(self, ins):
+        values = self.operands(ins, 1, start = 0, destination = False)
+        if values is None:
+            output = io.StringIO()
+            self.outputFile = output
+            self.scalarHandlers[ins.opcode](ins)
+            text = output.getvalue()
+            for index in self.active.tolist():
+                self.outputs[index].write(text)
+            return
+        value = values[0]
+        if kindOf(value) == "bool":
+            texts = ["true" if item else "false" for item in value.tolist()]
+        else:
+            texts = [str(item) for item in value.tolist()]
+        for index, text in zip(self.active.tolist(), texts):
+            self.outputs[index].write(text)
+        self.pc += 1
+
+#spustí program nad všemi vstupy, vrací seznam dvojic (návratový kód, výstup)
+def runLockstep(program, inputFiles):
+    return LockstepInterpret(program, inputFiles).run()
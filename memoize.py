@@ -0,0 +1,126 @@
+#memoizace volání čistých podprogramů (volba --memoize)
+
+from interpret import Frame
+
+#analýza čistých podprogramů pro memoizaci volání
+#podprogram (návěští, na které vede CALL) je čistý, pokud neprovádí READ, WRITE, EXIT, DPRINT ani BREAK,
+#nepřistupuje ke GF, volá jen čisté podprogramy a rámce na zásobníku LF má vyvážené
+#(nikdy nesáhne pod rámec, se kterým byl zavolán, a při RETURN je na něm zpět)
+#jeho výsledek tedy závisí jen na vrcholu LF, TF a datovém zásobníku
+#chybně zapsané instrukce (špatný počet argumentů, chybějící název) podprogram dělají nečistým,
+#chybu pak ohlásí až interpret při jejich provedení
+def findPureSubroutines(program):
+    labels = program.link()
+    forbidden = ("READ", "WRITE", "EXIT", "DPRINT", "BREAK")
+    jumps = ("JUMP", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS")
+    callees = dict()
+    for ins in program.ins:
+        if ins.opcode == "CALL" and len(ins.arg) == 1 and ins.arg[0].name in labels:
+            callees[ins.arg[0].name] = None
+    pure = set()
+    for name in callees:
+        called = set()
+        depths = dict()
+        work = [(labels[name] - 1, 0)]
+        ok = True
+        while work and ok:
+            index, depth = work.pop()
+            if index in depths:
+                ok = depths[index] == depth
+                continue
+            if index >= len(program.ins):
+                ok = False
+                break
+            depths[index] = depth
+            ins = program.ins[index]
+            if ins.opcode in forbidden:
+                ok = False
+            elif any(arg.type == "var" and (arg.name is None or arg.name.startswith("GF@")) for arg in ins.arg):
+                ok = False
+            elif ins.opcode == "RETURN":
+                ok = depth == 0
+            elif ins.opcode == "PUSHFRAME":
+                work.append((index + 1, depth + 1))
+            elif ins.opcode == "POPFRAME":
+                ok = depth > 0
+                work.append((index + 1, depth - 1))
+            elif ins.opcode in jumps:
+                if len(ins.arg) == 0 or ins.arg[0].name not in labels:
+                    ok = False
+                else:
+                    work.append((labels[ins.arg[0].name] - 1, depth))
+                    if ins.opcode != "JUMP":
+                        work.append((index + 1, depth))
+            elif ins.opcode == "CALL":
+                if len(ins.arg) != 1 or ins.arg[0].name not in labels:
+                    ok = False
+                else:
+                    called.add(ins.arg[0].name)
+                    work.append((index + 1, depth))
+            else:
+                work.append((index + 1, depth))
+        if ok:
+            callees[name] = called
+            pure.add(name)
+    #podprogram volající nečistý podprogram není čistý
+    changed = True
+    while changed:
+        changed = False
+        for name in list(pure):
+            if not callees[name] <= pure:
+                pure.discard(name)
+                changed = True
+    return pure
+
+#klíčem volání je návěští, obsah vrcholu LF, TF a datového zásobníku
+#hodnoty se ukládají i s typem, aby se nezaměnilo True a 1
+def frameKey(frame):
+    if frame is None:
+        return None
+    return tuple((name, type(value), value) for name, value in frame.vars.items())
+
+def stackKey(stack):
+    return tuple((type(value), value) for value in stack)
+
+#memoizace volání čistých podprogramů s omezenou LRU cache
+#výsledkem volání je obsah vrcholu LF, TF a datového zásobníku po návratu z podprogramu
+#jednu instanci lze použít pro více po sobě jdoucích běhů téhož programu
+class Memoizer:
+    def __init__(self, program, size = 1024):
+        self.pure = findPureSubroutines(program)
+        self.size = size
+        self.cache = dict()
+        self.hits = 0
+        self.misses = 0
+    def key(self, name, memory):
+        localFrame = memory.localFrames[-1] if memory.localFrames else None
+        return (name, frameKey(localFrame), frameKey(memory.temporaryFrame), stackKey(memory.dataStack))
+    #vrátí uložený výsledek volání, nebo None
+    def lookup(self, key):
+        result = self.cache.pop(key, None)
+        if result is None:
+            self.misses += 1
+            return None
+        self.cache[key] = result
+        self.hits += 1
+        return result
+    def store(self, key, memory):
+        localFrame = memory.localFrames[-1] if memory.localFrames else None
+        localVars = dict(localFrame.vars) if localFrame is not None else None
+        temporaryVars = dict(memory.temporaryFrame.vars) if memory.temporaryFrame is not None else None
+        self.cache[key] = (localVars, temporaryVars, list(memory.dataStack))
+        if len(self.cache) > self.size:
+            del self.cache[next(iter(self.cache))]
+    #přehraje výsledek volání do paměti, jako by podprogram proběhl
+    def replay(self, result, memory):
+        localVars, temporaryVars, dataStack = result
+        if localVars is not None:
+            memory.localFrames[-1].vars = dict(localVars)
+        if temporaryVars is None:
+            memory.temporaryFrame = None
+        else:
+            memory.temporaryFrame = Frame()
+            memory.temporaryFrame.vars = dict(temporaryVars)
+        memory.dataStack[:] = dataStack
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.cache)}
@@ -0,0 +1,93 @@
+#dlouho běžící interpret na unixovém socketu s cache programů (volba --server)
+
+import io
+import os
+import threading
+import hashlib
+import json
+import socketserver
+from sys import stderr
+
+from interpret import IPPError, parseProgram, runProgram
+
+#LRU cache zparsovaných a slinkovaných programů, klíčem je sha256 hash XML zdrojového kódu
+#slovník udržuje pořadí vložení, naposledy použitý program se přesouvá na konec
+#server ji sdílí mezi vlákny spojení, proto se všechny operace provádí pod zámkem
+class ProgramCache:
+    def __init__(self, size):
+        self.size = size
+        self.programs = dict()
+        self.lock = threading.Lock()
+    def get(self, programHash):
+        with self.lock:
+            program = self.programs.pop(programHash, None)
+            if program is not None:
+                self.programs[programHash] = program
+            return program
+    def add(self, programHash, program):
+        with self.lock:
+            self.programs.pop(programHash, None)
+            self.programs[programHash] = program
+            while len(self.programs) > self.size:
+                del self.programs[next(iter(self.programs))]
+
+#dlouho běžící interpret, vyřizuje požadavky nad cache programů
+#požadavek: {"program": XML} nebo {"hash": hash dříve poslaného programu} a "input" se vstupem programu
+#odpověď: {"hash": ..., "exitCode": ..., "stdout": ...}
+#každý požadavek běží s vlastním omezením výpočtu limits (parametry třídy Budget),
+#zacyklený program tak skončí chybou BudgetError a neblokuje vlákno serveru
+class InterpretServer:
+    def __init__(self, cacheSize, limits = None):
+        self.cache = ProgramCache(cacheSize)
+        self.limits = limits
+    def execute(self, request):
+        if "program" in request:
+            text = request["program"]
+            programHash = hashlib.sha256(text.encode()).hexdigest()
+            program = self.cache.get(programHash)
+            if program is None:
+                try:
+                    program = parseProgram(text)
+                    program.link()
+                except IPPError as e:
+                    stderr.write(str(e))
+                    return {"hash": programHash, "exitCode": e.code, "stdout": ""}
+                self.cache.add(programHash, program)
+        else:
+            programHash = request.get("hash")
+            program = self.cache.get(programHash)
+            if program is None:
+                return {"hash": programHash, "exitCode": 31, "stdout": "", "error": "unknown program"}
+        output = io.StringIO()
+        code = runProgram(program, io.StringIO(request.get("input", "")), output, self.limits)
+        return {"hash": programHash, "exitCode": code, "stdout": output.getvalue()}
+
+#naslouchá na lokálním unixovém socketu, požadavky i odpovědi jsou JSON objekty na jednom řádku
+#každé spojení obsluhuje vlastní vlákno, takže klient, který spojení drží otevřené, neblokuje ostatní
+#bez zadaných limitů má každý požadavek nejvýš serverSeconds sekund
+serverSeconds = 10
+
+def runServer(path, cacheSize, limits = None):
+    if limits is None or all(limit is None for limit in limits):
+        limits = (None, serverSeconds, None, None)
+    service = InterpretServer(cacheSize, limits)
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    response = service.execute(json.loads(line))
+                except Exception as e:
+                    response = {"exitCode": 31, "stdout": "", "error": "wrong request {}".format(e)}
+                self.wfile.write(json.dumps(response).encode() + b"\n")
+                self.wfile.flush()
+    if os.path.exists(path):
+        os.unlink(path)
+    class Server(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+    with Server(path, Handler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
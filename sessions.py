@@ -0,0 +1,113 @@
+#asynchronní interpret a interaktivní sezení na unixovém socketu (volba --sessions)
+
+import io
+import os
+import asyncio
+from sys import stderr
+
+from interpret import Interpret, IPPError, ProgramExit
+from budget import Budget
+from threadedio import LineDecoder
+
+#výstup asynchronního interpretu: text zapisuje do asyncio streamu (StreamWriter) jako UTF-8
+#na odeslání dat (writer.drain()) čeká interpret v místech, kde předává řízení event loopu
+class StreamOutput:
+    def __init__(self, writer):
+        self.writer = writer
+    def write(self, text):
+        self.writer.write(text.encode())
+
+#asynchronní varianta interpretu, program běží jako korutina
+#READ čeká na řádek ze vstupního asyncio streamu (reader.readline()) a neblokuje ostatní sezení,
+#WRITE zapisuje do writeru a každých yieldEvery instrukcí interpret předá řízení event loopu,
+#takže dlouho běžící program nevyhladoví ostatní sezení ve stejném procesu
+#vstup se dekóduje stejně jako soubor (LineDecoder), stopa běhu a periodické kontroly (např. Budget)
+#fungují stejně jako v Interpret.run()
+class AsyncInterpret(Interpret):
+    def __init__(self, program, reader, writer, yieldEvery = 1000, **options):
+        super().__init__(program, None, StreamOutput(writer), **options)
+        self.reader = reader
+        self.writer = writer
+        self.yieldEvery = yieldEvery
+        self.lineDecoder = LineDecoder()
+        self.pendingLines = []
+        self.inputDone = False
+    #vrací návratový kód programu, chyby se šíří jako IPPError
+    async def run(self):
+        ins = self.program.ins
+        end = len(ins) + 1
+        record = self.trace.append if self.trace is not None else None
+        steps = 0
+        try:
+            try:
+                self.runPeriodic()
+                while self.pc != end:
+                    instruction = ins[self.pc - 1]
+                    if record is not None:
+                        record((instruction.order, instruction.opcode))
+                    if instruction.opcode == "READ":
+                        await self.readAsync(instruction)
+                    else:
+                        self.handlers[instruction.opcode](instruction)
+                    self.executed += 1
+                    if self.executed >= self.nextCheck:
+                        self.runPeriodic()
+                    steps += 1
+                    if steps == self.yieldEvery:
+                        steps = 0
+                        await self.writer.drain()
+                        await asyncio.sleep(0)
+            except ProgramExit as e:
+                if e.code != 0:
+                    self.dumpTrace()
+                return e.code
+            except ConnectionError:
+                #odpojení klienta není chyba programu, stopa se nevypisuje
+                raise
+            except Exception:
+                self.dumpTrace()
+                raise
+            return 0
+        finally:
+            self.debugOutput.flush()
+            await self.writer.drain()
+    #načte řádek z readeru a provede s ním obyčejný READ
+    async def readAsync(self, ins):
+        if len(ins.arg) != 2 or ins.arg[0].type != "var" or ins.arg[1].type != "type":
+            return self.read(ins)
+        await self.writer.drain()
+        while not self.pendingLines and not self.inputDone:
+            data = await self.reader.readline()
+            self.inputDone = not data
+            self.pendingLines.extend(self.lineDecoder.decode(data, final = self.inputDone))
+        self.inputFile = io.StringIO(self.pendingLines.pop(0) if self.pendingLines else "")
+        self.read(ins)
+
+#interaktivní sezení nad jedním programem: každé spojení na unixovém socketu spustí vlastní běh programu,
+#vstup spojení čte READ a výstup programu se posílá zpět, všechna sezení běží v jednom procesu
+#limits (parametry třídy Budget) omezují každé sezení zvlášť, další parametry se předají AsyncInterpret
+def runSessions(program, path, yieldEvery, limits = None, **options):
+    async def session(reader, writer):
+        try:
+            interpreter = AsyncInterpret(program, reader, writer, yieldEvery, **options)
+            if limits is not None:
+                interpreter.periodic.append(Budget(*limits).check)
+            await interpreter.run()
+        except IPPError as e:
+            stderr.write(str(e))
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    async def serve():
+        server = await asyncio.start_unix_server(session, path, backlog = 4096)
+        async with server:
+            await server.serve_forever()
+    if os.path.exists(path):
+        os.unlink(path)
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.unlink(path)
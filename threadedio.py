@@ -0,0 +1,156 @@
+#vstup a výstup interpretu obsluhovaný vlákny na pozadí (volba --threaded-io)
+
+import io
+import os
+import codecs
+import queue
+import threading
+
+from interpret import IPPError
+
+#dekóduje proud bajtů po částech na řádky textu stejně jako textový soubor
+#(kódování, převod \r\n a \r na \n), neúplný poslední řádek si pamatuje do dalších dat
+class LineDecoder:
+    def __init__(self, encoding = "utf-8", errors = "strict"):
+        self.decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(errors), translate = True)
+        self.rest = ""
+    #vrátí seznam celých řádků (včetně \n), s final=True i zbytek bez konce řádku
+    def decode(self, data, final = False):
+        parts = (self.rest + self.decoder.decode(data, final = final)).split("\n")
+        self.rest = parts.pop()
+        lines = [part + "\n" for part in parts]
+        if final and self.rest:
+            lines.append(self.rest)
+            self.rest = ""
+        return lines
+
+#vstup načítaný dopředu vláknem na pozadí, pro interpret se chová jako soubor s metodou readline()
+#vlákno čte ze souborového deskriptoru po blocích, dekóduje je stejně jako textový soubor
+#(kódování souboru, převod \r\n a \r na \n), rozdělí na řádky a dávky řádků ukládá do omezené fronty
+#soubory bez deskriptoru (např. io.StringIO) čte po řádcích přes readline()
+#chyba čtení se ohlásí až při readline(), které by data za chybou potřebovalo
+class PrefetchInput:
+    def __init__(self, file, blockSize = 65536, queueSize = 64):
+        self.file = file
+        self.blockSize = blockSize
+        self.queue = queue.Queue(queueSize)
+        self.lines = []
+        self.index = 0
+        self.done = False
+        self.thread = threading.Thread(target = self.readLoop, daemon = True)
+        self.thread.start()
+    def readLoop(self):
+        try:
+            try:
+                fd = self.file.fileno()
+            except (AttributeError, OSError, ValueError):
+                fd = None
+            if fd is None:
+                self.readLines()
+            else:
+                self.readBlocks(fd)
+            self.queue.put(None)
+        except Exception as e:
+            self.queue.put(e)
+    def readLines(self):
+        batch = []
+        for line in iter(self.file.readline, ""):
+            batch.append(line)
+            if len(batch) == 256:
+                self.queue.put(batch)
+                batch = []
+        if batch:
+            self.queue.put(batch)
+    def readBlocks(self, fd):
+        decoder = LineDecoder(getattr(self.file, "encoding", None) or "utf-8", getattr(self.file, "errors", None) or "strict")
+        while True:
+            data = os.read(fd, self.blockSize)
+            lines = decoder.decode(data, final = not data)
+            if lines:
+                self.queue.put(lines)
+            if not data:
+                break
+    def readline(self):
+        while self.index == len(self.lines):
+            if self.done:
+                return ""
+            batch = self.queue.get()
+            if batch is None:
+                self.done = True
+                return ""
+            if isinstance(batch, Exception):
+                self.done = True
+                raise batch
+            self.lines = batch
+            self.index = 0
+        line = self.lines[self.index]
+        self.index += 1
+        return line
+    def close(self):
+        self.file.close()
+
+#výstup zapisovaný vláknem na pozadí: write() text jen připojí k dávce, plná dávka jde do omezené fronty,
+#ze které ji vlákno zapíše do souboru, pořadí zápisů se tak zachová
+#flush() počká, až vlákno zapíše všechno, close() navíc vlákno ukončí
+#chyba zápisu (např. zavřená roura) se ohlásí při dalším write(), flush() nebo close() jako IPPError s kódem 12
+class BackgroundOutput:
+    def __init__(self, file, batchSize = 65536, queueSize = 16):
+        self.file = file
+        self.batchSize = batchSize
+        self.parts = []
+        self.size = 0
+        self.error = None
+        self.queue = queue.Queue(queueSize)
+        self.thread = threading.Thread(target = self.writeLoop, daemon = True)
+        self.thread.start()
+    def writeLoop(self):
+        while True:
+            chunk = self.queue.get()
+            try:
+                if chunk is None:
+                    return
+                if self.error is None:
+                    self.file.write(chunk)
+                    if self.queue.empty():
+                        self.file.flush()
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+    def check(self):
+        if self.error is not None:
+            raise IPPError("cannot write output {}".format(self.error), 12)
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.batchSize:
+            self.push()
+    def push(self):
+        self.check()
+        if self.parts:
+            self.queue.put("".join(self.parts))
+            self.parts = []
+            self.size = 0
+    def flush(self):
+        self.push()
+        self.queue.join()
+        self.check()
+        try:
+            self.file.flush()
+        except Exception as e:
+            raise IPPError("cannot write output {}".format(e), 12)
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.queue.put(None)
+            self.thread.join()
+    #snapshot zjišťuje pozici ve výstupu až po flush()
+    def seekable(self):
+        return self.file.seekable()
+    def tell(self):
+        return self.file.tell()
+    def seek(self, position, whence = io.SEEK_SET):
+        return self.file.seek(position, whence)
+    def truncate(self):
+        return self.file.truncate()